@@ -3,8 +3,9 @@ Configuration for Education Insights Agents
 """
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 
-@dataclass
+@dataclass(frozen=True)
 class AgentConfig:
     """Configuration for agent settings"""
     project_id: str
@@ -15,8 +16,9 @@ class AgentConfig:
     max_output_tokens: int = 2048
 
 
+@lru_cache(maxsize=1)
 def get_config() -> AgentConfig:
-    """Get configuration from environment variables or defaults"""
+    """Get configuration from environment variables or defaults (read once per process)"""
     project_id = os.getenv("GOOGLE_CLOUD_PROJECT", "qwiklabs-gcp-04-b5171aa68bec")
     
     if project_id == "your-project-id":
@@ -139,6 +139,7 @@ IMPORTANT:
     agent = LlmAgent(
         name="InsightsAgent",
         model="gemini-2.0-flash-exp",
+        description="Turns school data into role-specific (parent/educator/official) recommendations",
         instruction=instruction,
         tools=[]  # No sub-agents for now - agent will generate insights directly
     )
@@ -5,12 +5,31 @@ Runs multi-agent system directly
 """
 
 import os
+import asyncio
+import hashlib
+import html
+import io
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import time
+from types import SimpleNamespace
 from typing import Optional, Dict, Any
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+import httpx
+import orjson
+from cachetools import TTLCache
+from jinja2 import Environment, FileSystemLoader
+from markdown_it import MarkdownIt
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, FileResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+import google.genai as genai
+import google.genai.types as types
 
 # Import the agent system
 from agents.config import get_config
@@ -19,45 +38,500 @@ from agents.root_agent import create_root_agent
 # Import the response formatter
 from tools.response_formatter import format_response_with_visualizations, load_maps_api_key
 
+# Import the school matching tools
+from mcp_servers.tools.student_profile import create_student_profile
+from mcp_servers.tools.school_matcher import (
+    match_schools,
+    rank_schools,
+    generate_school_recommendations
+)
+from mcp_servers.tools.school_enrichment import enrich_school
+
+# Import the BigQuery tools
+from tools.bigquery_tools import (
+    find_high_need_low_tech_spending,
+    find_high_graduation_low_funding,
+    find_strong_stem_low_class_size
+)
+
+# Structured logging: records go through a queue so request handlers never block
+# on stdout; a background listener writes one JSON object per line, which Cloud
+# Run ingests as jsonPayload (queryable from Logging / a BigQuery log sink)
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {"severity": record.levelname, "message": record.getMessage(), "logger": record.name}
+        payload.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(_JsonFormatter())
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+
+# The API and the tool packages it calls into share the queued JSON handler and LOG_LEVEL
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+for _name in ("api", "tools", "mcp_servers"):
+    _pkg_logger = logging.getLogger(_name)
+    _pkg_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    _pkg_logger.addHandler(_queue_handler)
+    _pkg_logger.propagate = False
+
+logger = logging.getLogger("api")
+
 # Initialize FastAPI
-app = FastAPI(title="Education Insights API")
+# Routes that return dicts (e.g. /match_schools with its card HTML) are serialized with orjson
+app = FastAPI(title="Education Insights API", default_response_class=ORJSONResponse)
+
+# Enable CORS for frontend. The bundled UI is same-origin; set CORS_ORIGINS to a
+# comma-separated list to pin cross-origin callers instead of allowing any origin
+CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",") if o.strip()]
 
-# Enable CORS for frontend
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type"],
+    max_age=86400,  # Browsers cache preflight results for a day
 )
 
+# Largest request body accepted (20MB upload + form fields); checked from Content-Length
+MAX_REQUEST_BYTES = 21 * 1024 * 1024
+
+class RequestSizeLimitMiddleware:
+    """Reject oversize requests with a 413 before Starlette spools the body"""
+    
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_bytes:
+                        response = Response(b'{"detail":"Request too large"}', status_code=413, media_type="application/json")
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+app.add_middleware(RequestSizeLimitMiddleware, max_bytes=MAX_REQUEST_BYTES)
+
+# Compress HTML/JSON payloads (index.html, school-card HTML); SSE streams are left alone
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with a Cache-Control header on top of Starlette's ETag/Last-Modified handling"""
+    
+    # Asset names aren't content-hashed, so no `immutable` - browsers reuse them for an hour,
+    # then revalidate with If-None-Match and get a 304
+    CACHE_CONTROL = "public, max-age=3600"
+    
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = self.CACHE_CONTROL
+        return response
+
 # Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
+
+INDEX_PATH = os.path.join("static", "index.html")
+
+# Chat UI page, read once at startup (see _load_index)
+_index_html: Optional[bytes] = None
+_index_etag: Optional[str] = None
 
 # Global variables (lazy initialization on first request)
 config = None
 root_agent = None
 maps_api_key = None
+genai_client = None  # Shared Gemini client (keeps its HTTPS connections open across requests)
+tool_context = None  # Stand-in ADK ToolContext for calling BigQuery tools directly
+
+# Recent Gemini answers for general questions, keyed by role + normalized message + attachment
+# (only touched from the event loop, so like _canned_cache it needs no lock)
+_response_cache = TTLCache(maxsize=1024, ttl=600)
+_general_inflight: Dict[str, asyncio.Task] = {}
+
+# Questions about "today"/"current" data aren't cached - the answer may change within the TTL
+TIME_SENSITIVE_RE = re.compile(r"\b(today|tonight|tomorrow|yesterday|current(ly)?|now|latest|this (week|month|year))\b", re.IGNORECASE)
+
+def _file_digest(file_bytes: Optional[bytes]) -> str:
+    """Content digest of an attachment (hashed once per request, reused by the caches)"""
+    # blake2b is fast and only needs to tell attachments apart, not resist attacks
+    return hashlib.blake2b(file_bytes, digest_size=16).hexdigest() if file_bytes else ""
+
+def _response_cache_key(message: str, user_role: str, file_digest: str = "") -> str:
+    """Stable cache key for a (role, message, attachment) triple"""
+    normalized = message.strip().lower()
+    return hashlib.sha1(f"{user_role}|{normalized}|{file_digest}".encode()).hexdigest()
+
+# Markdown → HTML in one linear pass (raw HTML from the model is escaped, not passed through)
+MARKDOWN = MarkdownIt("commonmark", {"html": False, "breaks": True}).enable(["table", "strikethrough"])
+
+def _render_markdown(text: str) -> str:
+    """Render Gemini markdown to HTML (headings are styled by the .md-body rules in index.html)"""
+    return MARKDOWN.render(text)
+
+# Static HTML shells for general answers, built once at import; requests only
+# fill in the rendered answer (or the escaped question + error for the fallback)
+ANSWER_PREFIX = """<div style="padding: 20px;">
+<h2 style="color: #1f2937; margin-bottom: 15px;">🎓 Education Insights</h2>
+<div class="md-body" style="background: white; padding: 20px; border-radius: 8px; line-height: 1.6; color: #374151;">
+"""
+ANSWER_SUFFIX = """
+</div>
+<p style="margin-top: 15px; color: #6b7280; font-size: 0.9rem;">
+💡 <em>Powered by Gemini AI - Ask me anything about education, schools, or learning!</em>
+</p>
+</div>"""
+
+FALLBACK_PREFIX = """<div style="padding: 20px;">
+<h2 style="color: #1f2937; margin-bottom: 15px;">💡 How I Can Help</h2>
+<p style="margin-bottom: 20px;">I can help you with education-related questions. Try asking about:</p>
+
+<div style="background: linear-gradient(to right, #dbeafe, #f0f9ff); padding: 15px; border-radius: 8px; margin: 15px 0;">
+<p style="color: #1e3a8a;">• Schools with high low-income students and low tech spending</p>
+</div>
+
+<div style="background: linear-gradient(to right, #fef3c7, #fef9c3); padding: 15px; border-radius: 8px; margin: 15px 0;">
+<p style="color: #78350f;">• Schools with high graduation rates despite low funding</p>
+</div>
+
+<div style="background: linear-gradient(to right, #e9d5ff, #f3e8ff); padding: 15px; border-radius: 8px; margin: 15px 0;">
+<p style="color: #581c87;">• Schools with strong STEM programs and low class sizes</p>
+</div>
+
+<p style="margin-top: 20px; color: #4b5563;"><strong>Your question:</strong> \""""
+FALLBACK_MID = """"</p>
+<p style="color: #ef4444; margin-top: 10px;">Error: """
+FALLBACK_SUFFIX = """</p>
+</div>"""
+
+# School Match Engine card markup, compiled once at import. Autoescaping covers every
+# value interpolated from BigQuery / Gemini enrichment (school names, districts, ...)
+TEMPLATES = Environment(loader=FileSystemLoader("templates"), autoescape=True)
+SCHOOL_CARDS_TEMPLATE = TEMPLATES.get_template("school_match_cards.html")
+# orjson options for the window.schoolsData payload (BigQuery rows can carry numpy values)
+SCHOOLS_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+# (minimum match score, badge tier) - first match wins
+MATCH_BADGE_TIERS = ((90, "high"), (80, "mid"), (70, "low"), (float("-inf"), "poor"))
+
+# Research question → (BigQuery tool, row limit, log label)
+RESEARCH_TOOLS = {
+    "high_need_low_tech": (find_high_need_low_tech_spending, 5, "Q1: High need + low tech spending"),
+    "high_grad_low_funding": (find_high_graduation_low_funding, 10, "Q2: High graduation + low funding"),
+    "stem_excellence": (find_strong_stem_low_class_size, 10, "Q3: STEM programs + small classes"),
+}
+
+# Rendered research-question answers keyed by (query_type, limit, user_role);
+# in-flight tasks let concurrent identical requests share one computation
+_canned_cache = TTLCache(maxsize=64, ttl=3600)
+_canned_inflight: Dict[tuple, asyncio.Task] = {}
+
+def _render_research_answer(query_type: str, message: str, tool_context) -> tuple:
+    """Run a research-question tool and format it as HTML; returns (response_text, succeeded)"""
+    tool, limit, _ = RESEARCH_TOOLS[query_type]
+    result = tool(limit=limit, tool_context=tool_context)
+    if result['status'] != 'success':
+        return result.get('message', 'No data found.'), False
+    
+    formatted = format_response_with_visualizations(
+        query=message,
+        data=result.get('data', []),
+        query_type=query_type,
+        maps_api_key=maps_api_key,
+        state_averages=result.get('state_averages', {})
+    )
+    return formatted['full_response'], True
+
+async def _compute_canned(key: tuple, query_type: str, message: str, tool_context) -> str:
+    """Run the tool + formatter off the event loop and cache successful answers"""
+    response_text, succeeded = await asyncio.to_thread(_render_research_answer, query_type, message, tool_context)
+    if succeeded:
+        _canned_cache[key] = response_text
+    return response_text
+
+async def _canned_response(query_type: str, message: str, user_role: str, tool_context) -> str:
+    """Cached research-question answer; concurrent identical requests share one in-flight task"""
+    key = (query_type, RESEARCH_TOOLS[query_type][1], user_role)
+    if key in _canned_cache:
+        return _canned_cache[key]
+    
+    task = _canned_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_compute_canned(key, query_type, message, tool_context))
+        _canned_inflight[key] = task
+        task.add_done_callback(lambda _: _canned_inflight.pop(key, None))
+    # Shielded so one caller disconnecting doesn't cancel the work for the others
+    return await asyncio.shield(task)
+
+# User-type detection: one precompiled scan instead of chained substring checks
+USER_TYPE_RE = re.compile(r"\b(parent|teacher|educator|official|policymaker|board)\b", re.IGNORECASE)
+USER_TYPE_MAP = {
+    "parent": "parent",
+    "teacher": "educator",
+    "educator": "educator",
+    "official": "policymaker",
+    "policymaker": "policymaker",
+    "board": "policymaker",
+}
+
+def _detect_user_type(text: Optional[str], default: str = "parent") -> str:
+    """Map free-form role text (e.g. 'Teacher', 'school board') to parent/educator/policymaker"""
+    m = USER_TYPE_RE.search(text or "")
+    return USER_TYPE_MAP[m.group(1).lower()] if m else default
+
+# Template question → research-question plan (deterministic tool dispatch, no LLM)
+# Canonical phrasings of the research questions. Every pattern needs all of its
+# question's terms (lookaheads, any order), so a general question that only shares
+# a word or two - "help writing a grant proposal" - still goes to Gemini
+PLAN_TEMPLATES = [
+    (re.compile(
+        r"^(?=.*\bschools?\b)(?=.*\bgrants?\b)(?=.*\b(tech|technology|computers?|devices?)\b)"
+        r"(?=.*\b(high[- ]need|needs?|needy|priority|prioritize|low[- ]income|poverty)\b)",
+        re.IGNORECASE | re.DOTALL
+    ), "high_need_low_tech"),
+    (re.compile(
+        r"^(?=.*\bschools?\b)(?=.*\bhigh[- ]performing\b)(?=.*\bhigh[- ](need|poverty)\b)",
+        re.IGNORECASE | re.DOTALL
+    ), "high_grad_low_funding"),
+    (re.compile(
+        r"^(?=.*\b(schools?|programs?)\b)(?=.*\bstem\b)(?=.*\b(small|smaller|low)\b.*\bclass(es|rooms?)?\b)",
+        re.IGNORECASE | re.DOTALL
+    ), "stem_excellence"),
+]
+
+# Intent keywords → concept, found in one scan of the message. Keywords that can
+# overlap ("high graduation rate", "small class size") share a concept, so the
+# non-overlapping scan never loses information
+INTENT_KEYWORDS = {
+    "low-income": "need",
+    "technology spending": "tech",
+    "tech spending": "tech",
+    "high graduation": "grad",
+    "graduation rate": "grad",
+    "below-average funding": "funding",
+    "low funding": "funding",
+    "despite": "funding",
+    "stem": "stem",
+    "class size": "class",
+    "small class": "class",
+}
+# One named group per concept, so a match reports its concept via m.lastgroup
+INTENT_KEYWORDS_RE = re.compile("|".join(
+    f"(?P<{concept}>" + "|".join(re.escape(k) for k, c in INTENT_KEYWORDS.items() if c == concept) + ")"
+    for concept in dict.fromkeys(INTENT_KEYWORDS.values())
+), re.IGNORECASE)
+
+# Concepts a message must mention → research question (checked in order)
+INTENT_RULES = (
+    (frozenset({"need", "tech"}), "high_need_low_tech"),
+    (frozenset({"grad", "funding"}), "high_grad_low_funding"),
+    (frozenset({"stem", "class"}), "stem_excellence"),
+)
+
+def _research_query_type(message: str) -> Optional[str]:
+    """Return the research-question type a message asks about, or None for general questions"""
+    # Patterns are case-insensitive, so ASCII messages (the common case) are scanned
+    # without building a lowercased copy; others are lowercased for Unicode folding
+    text = message if message.isascii() else message.lower()
+    hits = {m.lastgroup for m in INTENT_KEYWORDS_RE.finditer(text)}
+    for required, query_type in INTENT_RULES:
+        if required <= hits:
+            return query_type
+    # Canonical phrasings of the same questions (from the DataAgent examples) also
+    # map straight to their tool instead of going through an LLM turn
+    for pattern, query_type in PLAN_TEMPLATES:
+        if pattern.search(text):
+            return query_type
+    return None
+
+def _general_system_instruction(user_role: str, file_context: str = "") -> str:
+    """Role-aware system instruction for general (non research-question) Gemini answers"""
+    return f"""You are an education expert assistant helping {user_role}s make informed decisions about schools and education.
+
+Provide helpful, practical advice based on education best practices. When asked for school recommendations, provide SPECIFIC school names, locations, and details whenever possible.
+
+Answer questions directly with concrete recommendations and examples. Be specific and actionable.
+
+Keep responses clear, detailed, and tailored to a {user_role}'s perspective.
+
+Note: For data-driven comparisons about California schools (2018 data), I can also provide detailed analytics about:
+- Schools with high low-income students and low tech spending
+- Schools with high graduation rates despite low funding
+- Schools with strong STEM programs and small class sizes{file_context}"""
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+def _reject_oversize_upload(file: UploadFile, max_mb: int, label: str = "File") -> None:
+    """Raise a 400 for uploads over max_mb, using the size Starlette recorded while spooling the form"""
+    if file.size is not None and file.size > max_mb * 1024 * 1024:
+        raise HTTPException(status_code=400, detail=f"{label} too large. Max {max_mb}MB.")
+
+async def _read_upload(file: UploadFile, max_mb: int, label: str = "File") -> bytes:
+    """Read an upload in chunks, giving up as soon as it passes max_mb"""
+    _reject_oversize_upload(file, max_mb, label)
+    
+    # file.size can be missing, so the limit is enforced again while reading -
+    # memory stays bounded by max_mb whatever the client sends
+    limit = max_mb * 1024 * 1024
+    buf = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        buf += chunk
+        if len(buf) > limit:
+            raise HTTPException(status_code=400, detail=f"{label} too large. Max {max_mb}MB.")
+    return bytes(buf)
+
+async def _read_chat_upload(file: UploadFile) -> bytes:
+    """Size-check and read a file attached to a chat question"""
+    # 10MB for images, 20MB for PDFs (and anything else)
+    if file.content_type and file.content_type.startswith('image/'):
+        file_bytes = await _read_upload(file, 10, "Image file")
+    elif file.content_type == 'application/pdf':
+        file_bytes = await _read_upload(file, 20, "PDF file")
+    else:
+        file_bytes = await _read_upload(file, 20)
+    
+    logger.debug("→ File processed: %s (%.2fMB, %s)", file.filename, len(file_bytes) / (1024 * 1024), file.content_type)
+    return file_bytes
+
+# Attachments at or above this size go through the Gemini Files API instead of inline bytes
+FILES_API_MIN_BYTES = 5 * 1024 * 1024
+# Uploaded files by content digest (Gemini keeps them 48h; re-upload well before that)
+_uploaded_files = TTLCache(maxsize=256, ttl=24 * 3600)
+
+async def _attachment_part(file_bytes: bytes, mime_type: str, file_digest: str) -> types.Part:
+    """Gemini part for an attachment - inline when small, a Files API reference when large"""
+    if len(file_bytes) < FILES_API_MIN_BYTES:
+        return types.Part(inline_data=types.Blob(mime_type=mime_type, data=file_bytes))
+    
+    # Large PDFs are uploaded once and referenced by URI, so repeat questions about the
+    # same document don't re-encode megabytes of base64 into every request body
+    uploaded = _uploaded_files.get(file_digest)
+    if uploaded is None:
+        uploaded = await _require_genai_client().aio.files.upload(
+            file=io.BytesIO(file_bytes),
+            config=types.UploadFileConfig(mime_type=mime_type)
+        )
+        _uploaded_files[file_digest] = uploaded
+        logger.debug("→ Uploaded attachment to Files API: %s", uploaded.name)
+    return types.Part.from_uri(file_uri=uploaded.uri, mime_type=uploaded.mime_type or mime_type)
+
+async def _general_contents(message: str, user_role: str, file: Optional[UploadFile] = None,
+                            file_bytes: Optional[bytes] = None, file_digest: str = ""):
+    """Gemini contents for a general question (multimodal when a file is attached)"""
+    # Create a contextualized prompt for the role
+    file_context = ""
+    if file:
+        file_context = f"\n\nThe user has attached a file ({file.filename}). Please analyze it in the context of their question."
+    
+    prompt = f"{_general_system_instruction(user_role, file_context)}\n\nUser Question: {message}"
+    
+    if file_bytes and file.content_type:
+        # Multimodal: text part + file part
+        return [
+            types.Part(text=prompt),
+            await _attachment_part(file_bytes, file.content_type, file_digest)
+        ]
+    # Text only
+    return prompt
+
+def _require_genai_client() -> genai.Client:
+    """Return the shared Gemini client, or raise if no API key was configured"""
+    if genai_client is None:
+        raise ValueError("GOOGLE_API_KEY environment variable not set")
+    return genai_client
+
+async def _compute_general(cache_key: str, cacheable: bool, message: str, user_role: str,
+                           file: Optional[UploadFile] = None, file_bytes: Optional[bytes] = None,
+                           file_digest: str = "") -> tuple:
+    """Ask Gemini a general question and render the answer; returns (response_text, cached_content_token_count)"""
+    # Built here so concurrent identical requests share one Files API upload too
+    contents = await _general_contents(message, user_role, file, file_bytes, file_digest)
+    
+    # Async client keeps the event loop free while Gemini is generating
+    response = await _require_genai_client().aio.models.generate_content(
+        model='gemini-2.5-flash',
+        contents=contents
+    )
+    
+    cached_content_token_count = None
+    if response.usage_metadata:
+        cached_content_token_count = response.usage_metadata.cached_content_token_count
+    
+    # Format as HTML with clean styling - convert markdown to HTML
+    response_text = "".join((ANSWER_PREFIX, _render_markdown(response.text), ANSWER_SUFFIX))
+    
+    if cacheable:
+        _response_cache[cache_key] = response_text
+    return response_text, cached_content_token_count
+
+# Connection pool for the shared Gemini client. Idle connections are kept for a
+# minute (httpx default: 5s) so requests a few seconds apart skip the TLS handshake
+GENAI_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60)
+
+# LAZY_INIT=1 defers agent setup to the first request (faster reloads in local dev)
+LAZY_INIT = os.getenv("LAZY_INIT", "0") == "1"
 
 def initialize_system():
-    """Initialize the agent system on first request"""
-    global config, root_agent, maps_api_key
+    """Initialize the agent system (at startup, or on first request with LAZY_INIT=1)"""
+    global config, root_agent, maps_api_key, genai_client, tool_context
     if config is None:
-        print("🚀 Initializing Education Insights Agent System...")
-        config = get_config()
+        logger.info("🚀 Initializing Education Insights Agent System...")
+        new_config = get_config()
         root_agent = create_root_agent(
-            project_id=config.project_id,
-            dataset=config.bigquery_dataset
+            project_id=new_config.project_id,
+            dataset=new_config.bigquery_dataset
         )
         maps_api_key = load_maps_api_key()
-        print(f"✅ Agents initialized for project: {config.project_id}")
+        
+        # Tools only read project/dataset from .state (and record last-query stats in it)
+        tool_context = SimpleNamespace(state={
+            "project_id": new_config.project_id,
+            "bigquery_dataset": new_config.bigquery_dataset
+        })
+        
+        # Use vertexai=False to ensure we use Google AI API, not Vertex AI
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if api_key:
+            genai_client = genai.Client(
+                api_key=api_key,
+                vertexai=False,
+                http_options=types.HttpOptions(async_client_args={"limits": GENAI_HTTP_LIMITS})
+            )
+        else:
+            # Research questions still work; general questions will get the fallback message
+            logger.warning("⚠️  GOOGLE_API_KEY not set - Gemini answers are disabled")
+        
+        # Publish config last - it is the "initialized" flag, so no request sees a half-built system
+        config = new_config
+        logger.info("✅ Agents initialized for project: %s", config.project_id)
         if maps_api_key:
-            print(f"✅ Google Maps API key loaded")
+            logger.info("✅ Google Maps API key loaded")
         else:
-            print("⚠️  Google Maps API key not found - maps will be disabled")
+            logger.warning("⚠️  Google Maps API key not found - maps will be disabled")
+
+# Concurrent first requests wait for one initialization instead of each building the agents
+_init_lock = asyncio.Lock()
+
+async def ensure_initialized():
+    """Run initialize_system() once, off the event loop, however many requests arrive at once"""
+    if config is not None:
+        return
+    async with _init_lock:
+        if config is None:
+            await asyncio.to_thread(initialize_system)
+
+# Longest question accepted from the UI - rejected with a 422 at the request boundary
+MAX_MESSAGE_CHARS = 4000
 
 class ChatMessage(BaseModel):
-    message: str
+    message: str = Field(..., max_length=MAX_MESSAGE_CHARS)
     user_id: Optional[str] = "default-user"
     user_role: Optional[str] = "parent"  # parent, educator, policymaker
     session_id: Optional[str] = None
@@ -69,301 +543,265 @@ class ChatResponse(BaseModel):
 
 @app.on_event("startup")
 async def startup_event():
-    """Startup message"""
-    print("\n" + "="*70)
-    print("✅ Education Insights Agent System Ready")
-    print("="*70 +"\n")
+    """Load static assets, build the agent system and print the startup message"""
+    _load_index()
+    if not LAZY_INIT:
+        # Pay config/agent/client setup before serving, not on the first user's request
+        try:
+            await ensure_initialized()
+        except Exception as e:
+            # Leave config unset so the first request retries initialization
+            logger.exception("❌ Startup initialization failed: %s", e)
+    logger.info("✅ Education Insights Agent System Ready")
 
-@app.get("/")
-async def root():
-    """Serve the chat UI"""
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush queued log records"""
+    _log_listener.stop()
+
+def _load_index():
+    """Read the chat UI into memory and compute its ETag"""
+    global _index_html, _index_etag
     try:
-        with open("static/index.html", "r") as f:
-            return HTMLResponse(f.read())
+        with open(INDEX_PATH, "rb") as f:
+            _index_html = f.read()
+        _index_etag = f'"{hashlib.md5(_index_html).hexdigest()}"'
     except FileNotFoundError:
+        logger.warning("⚠️  %s not found - / will return 404", INDEX_PATH)
+
+@app.get("/")
+async def root(request: Request):
+    """Serve the chat UI from memory (unchanged pages get a 304)"""
+    if _index_html is None:
         return HTMLResponse("<h1>Error: static/index.html not found</h1>", status_code=404)
+    
+    headers = {"ETag": _index_etag, "Cache-Control": "public, max-age=60"}
+    if request.headers.get("if-none-match") == _index_etag:
+        return Response(status_code=304, headers=headers)
+    return Response(_index_html, media_type="text/html", headers=headers)
+
+# Health payload never changes - serialize it once and reuse the same response
+HEALTH_RESPONSE = Response(content=b'{"status":"healthy","agent":"ready"}', media_type="application/json")
 
-@app.get("/health")
+@app.get("/health", include_in_schema=False)
 async def health():
-    """Health check endpoint"""
-    # Don't initialize on health check - just return ready
+    """Liveness check - the process is up (never touches the agent system)"""
+    return HEALTH_RESPONSE
+
+NOT_READY_RESPONSE = Response(content=b'{"status":"initializing"}', media_type="application/json", status_code=503)
+_warmup_task: Optional[asyncio.Task] = None
+
+async def _warmup():
+    """Background initialization started by the readiness probe"""
+    try:
+        await ensure_initialized()
+    except Exception as e:
+        # config stays unset, so the next probe retries
+        logger.exception("❌ Initialization from readiness probe failed: %s", e)
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """Readiness check - 503 until config, agents and clients are initialized"""
+    global _warmup_task
+    if config is None:
+        # LAZY_INIT (or a failed startup init): the probe itself kicks off initialization,
+        # so the instance warms up before real traffic is routed to it
+        if _warmup_task is None or _warmup_task.done():
+            _warmup_task = asyncio.create_task(_warmup())
+        return NOT_READY_RESPONSE
     return {
-        "status": "healthy",
-        "agent": "ready"
+        "status": "ready",
+        "project_id": config.project_id,
+        "dataset": config.bigquery_dataset,
+        "gemini": genai_client is not None
     }
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(
-    message: str = Form(...),
-    user_role: str = Form(...),
+    message: str = Form(..., max_length=MAX_MESSAGE_CHARS),
+    user_role: str = Form(..., max_length=32),
     file: Optional[UploadFile] = File(None)
 ):
     """
     Chat endpoint - runs multi-agent system to answer education queries
     Supports multimodal inputs: text + optional image/PDF file
     """
+    started = time.perf_counter()
     try:
-        # Initialize system on first request
-        initialize_system()
+        # No-op once startup has initialized the system (LAZY_INIT=1 initializes here)
+        await ensure_initialized()
         
-        file_info = ""
-        if file:
-            file_info = f" + 📎 {file.filename}"
+        user_role = _detect_user_type(user_role, default=user_role)
         
-        print(f"\n📨 User ({user_role}): {message}{file_info}")
-        print(f"   Processing with Education Insights Agent System...")
+        logger.info("📨 User (%s): %s%s", user_role, message, f" + 📎 {file.filename}" if file else "")
 
-        # Import the BigQuery tools
-        from tools.bigquery_tools import (
-            find_high_need_low_tech_spending,
-            find_high_graduation_low_funding,
-            find_strong_stem_low_class_size,
-            get_school_data
-        )
-        
-        # Create a mock context for tools (inheriting from dict for __setitem__ support)
-        class MockState(dict):
-            def __init__(self):
-                super().__init__()
-                self['project_id'] = config.project_id
-                self['bigquery_dataset'] = config.bigquery_dataset
-            
-            def get(self, key, default=None):
-                return super().get(key, default)
-        
-        class MockContext:
-            def __init__(self):
-                self.state = MockState()
-        
-        tool_context = MockContext()
-        
         # Analyze the query and call appropriate tool
-        query_lower = message.lower()
         response_text = None
-        query_type = None
-        data = []
-        
-        # Check for research question patterns
-        if "low-income" in query_lower and ("technology spending" in query_lower or "tech spending" in query_lower):
-            print("   → Q1: High need + low tech spending")
-            result = find_high_need_low_tech_spending(limit=5, tool_context=tool_context)
-            query_type = "high_need_low_tech"
-            
-            if result['status'] == 'success':
-                data = result.get('data', [])
-                state_averages = result.get('state_averages', {})
-                # Use the response formatter
-                formatted = format_response_with_visualizations(
-                    query=message,
-                    data=data,
-                    query_type=query_type,
-                    maps_api_key=maps_api_key,
-                    state_averages=state_averages
-                )
-                response_text = formatted['full_response']
-            else:
-                response_text = result.get('message', 'No data found.')
-                
-        elif ("high graduation" in query_lower or "graduation rate" in query_lower) and ("low funding" in query_lower or "below-average funding" in query_lower or "despite" in query_lower):
-            print("   → Q2: High graduation + low funding")
-            result = find_high_graduation_low_funding(limit=10, tool_context=tool_context)
-            query_type = "high_grad_low_funding"
-            
-            if result['status'] == 'success':
-                data = result.get('data', [])
-                state_averages = result.get('state_averages', {})
-                # Use the response formatter
-                formatted = format_response_with_visualizations(
-                    query=message,
-                    data=data,
-                    query_type=query_type,
-                    maps_api_key=maps_api_key,
-                    state_averages=state_averages
-                )
-                response_text = formatted['full_response']
-            else:
-                response_text = result.get('message', 'No data found.')
-                
-        elif "stem" in query_lower and ("class size" in query_lower or "small class" in query_lower):
-            print("   → Q3: STEM programs + small classes")
-            result = find_strong_stem_low_class_size(limit=10, tool_context=tool_context)
-            query_type = "stem_excellence"
-            
-            if result['status'] == 'success':
-                data = result.get('data', [])
-                state_averages = result.get('state_averages', {})
-                # Use the response formatter
-                formatted = format_response_with_visualizations(
-                    query=message,
-                    data=data,
-                    query_type=query_type,
-                    maps_api_key=maps_api_key,
-                    state_averages=state_averages
-                )
-                response_text = formatted['full_response']
-            else:
-                response_text = result.get('message', 'No data found.')
+        query_type = _research_query_type(message)
         
-        # If no specific pattern matched, use root_agent for general questions
+        # Research questions: BigQuery tool + formatter, cached per (query_type, limit, role)
+        if query_type:
+            logger.info("→ %s", RESEARCH_TOOLS[query_type][2])
+            response_text = await _canned_response(query_type, message, user_role, tool_context)
+        
+        cache_hit = False
+        cached_content_token_count = None
+        
+        # If no specific pattern matched, use Gemini for general questions
         if response_text is None:
-            print("   → General query - using Root Agent (ADK)")
+            logger.info("→ General query - using Gemini")
             
             try:
-                # Use Google Generative AI with API key for general questions
-                # Note: Specific research questions use ADK agents via BigQuery tools above
-                import google.genai as genai
-                
-                # Configure with API key (from environment variable)
-                # Use vertexai=False to ensure we use Google AI API, not Vertex AI
-                api_key = os.getenv("GOOGLE_API_KEY")
-                if not api_key:
-                    raise ValueError("GOOGLE_API_KEY environment variable not set")
-                
-                client = genai.Client(api_key=api_key, vertexai=False)
-                
                 # Process uploaded file if present
-                file_bytes = None
-                file_mime_type = None
-                if file:
-                    file_bytes = await file.read()
-                    file_size_mb = len(file_bytes) / (1024 * 1024)
-                    
-                    # Check file size limits
-                    if file.content_type.startswith('image/') and file_size_mb > 10:
-                        raise HTTPException(status_code=400, detail="Image file too large. Max 10MB.")
-                    elif file.content_type == 'application/pdf' and file_size_mb > 20:
-                        raise HTTPException(status_code=400, detail="PDF file too large. Max 20MB.")
-                    
-                    # Store file info for Gemini
-                    file_mime_type = file.content_type
-                    print(f"   → File processed: {file.filename} ({file_size_mb:.2f}MB, {file_mime_type})")
-                
-                # Create a contextualized prompt for the role
-                file_context = ""
-                if file:
-                    file_context = f"\n\nThe user has attached a file ({file.filename}). Please analyze it in the context of their question."
-                
-                system_instruction = f"""You are an education expert assistant helping {user_role}s make informed decisions about schools and education.
-
-Provide helpful, practical advice based on education best practices. When asked for school recommendations, provide SPECIFIC school names, locations, and details whenever possible.
-
-Answer questions directly with concrete recommendations and examples. Be specific and actionable.
-
-Keep responses clear, detailed, and tailored to a {user_role}'s perspective.
-
-Note: For data-driven comparisons about California schools (2018 data), I can also provide detailed analytics about:
-- Schools with high low-income students and low tech spending
-- Schools with high graduation rates despite low funding
-- Schools with strong STEM programs and small class sizes{file_context}"""
-                
-                # Build contents for Gemini (multimodal if file present)
-                if file_bytes and file_mime_type:
-                    # Multimodal: Create proper content structure
-                    import google.genai.types as types
-                    
-                    # Create parts correctly
-                    text_part = types.Part(text=f"{system_instruction}\n\nUser Question: {message}")
-                    image_part = types.Part(inline_data=types.Blob(mime_type=file_mime_type, data=file_bytes))
-                    
-                    contents = [text_part, image_part]
-                else:
-                    # Text only
-                    contents = f"{system_instruction}\n\nUser Question: {message}"
+                file_bytes = await _read_chat_upload(file) if file else None
+                file_digest = _file_digest(file_bytes)
                 
-                # Generate response using gemini-2.5-flash
-                response = client.models.generate_content(
-                    model='gemini-2.5-flash',
-                    contents=contents
-                )
+                # Reuse a recent answer to the same question (and same attachment)
+                cache_key = _response_cache_key(message, user_role, file_digest)
+                response_text = _response_cache.get(cache_key)
+                cache_hit = response_text is not None
                 
-                agent_response = response.text
-                print(f"   → Gemini 2.5 response length: {len(agent_response)}")
-                
-                # Format as HTML with clean styling - convert markdown to HTML
-                import html
-                import re
-                
-                # Convert markdown to HTML
-                formatted_text = agent_response
-                
-                # Headings: ### text -> styled heading
-                formatted_text = re.sub(r'^#### (.*?)$', r'<h4 style="color: #374151; font-size: 1rem; margin: 1rem 0 0.5rem 0; font-weight: 600;">\1</h4>', formatted_text, flags=re.MULTILINE)
-                formatted_text = re.sub(r'^### (.*?)$', r'<h3 style="color: #1f2937; font-size: 1.1rem; margin: 1.25rem 0 0.75rem 0; font-weight: 600;">\1</h3>', formatted_text, flags=re.MULTILINE)
-                formatted_text = re.sub(r'^## (.*?)$', r'<h2 style="color: #1f2937; font-size: 1.25rem; margin: 1.5rem 0 1rem 0; font-weight: 700;">\1</h2>', formatted_text, flags=re.MULTILINE)
-                formatted_text = re.sub(r'^# (.*?)$', r'<h1 style="color: #111827; font-size: 1.5rem; margin: 1.5rem 0 1rem 0; font-weight: 700;">\1</h1>', formatted_text, flags=re.MULTILINE)
-                
-                # Bold: **text** -> <strong>text</strong>
-                formatted_text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', formatted_text)
-                
-                # Italic: *text* -> <em>text</em> (but not if it's part of **)
-                formatted_text = re.sub(r'(?<!\*)\*(?!\*)([^\*]+?)(?<!\*)\*(?!\*)', r'<em>\1</em>', formatted_text)
-                
-                # Bullet points: * item -> • item
-                formatted_text = re.sub(r'^\* ', '• ', formatted_text, flags=re.MULTILINE)
-                formatted_text = re.sub(r'\n\* ', '\n• ', formatted_text)
-                
-                # Numbered lists: enhance spacing
-                formatted_text = re.sub(r'^(\d+\.)', r'<strong>\1</strong>', formatted_text, flags=re.MULTILINE)
-                
-                # Preserve line breaks
-                formatted_response = formatted_text.replace('\n', '<br>')
-                
-                response_text = f"""<div style="padding: 20px;">
-<h2 style="color: #1f2937; margin-bottom: 15px;">🎓 Education Insights</h2>
-<div style="background: white; padding: 20px; border-radius: 8px; line-height: 1.6; color: #374151;">
-{formatted_response}
-</div>
-<p style="margin-top: 15px; color: #6b7280; font-size: 0.9rem;">
-💡 <em>Powered by Gemini AI - Ask me anything about education, schools, or learning!</em>
-</p>
-</div>"""
+                if response_text is None:
+                    # Concurrent identical questions share one attachment upload and Gemini call
+                    task = _general_inflight.get(cache_key)
+                    if task is None:
+                        cacheable = not TIME_SENSITIVE_RE.search(message)
+                        task = asyncio.create_task(_compute_general(
+                            cache_key, cacheable, message, user_role, file, file_bytes, file_digest
+                        ))
+                        _general_inflight[cache_key] = task
+                        task.add_done_callback(lambda _: _general_inflight.pop(cache_key, None))
+                    response_text, cached_content_token_count = await asyncio.shield(task)
                 
             except Exception as e:
-                print(f"   ⚠️ Gemini error: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("⚠️ Gemini error: %s", e)
                 
                 # Fallback to helpful message
-                response_text = f"""<div style="padding: 20px;">
-<h2 style="color: #1f2937; margin-bottom: 15px;">💡 How I Can Help</h2>
-<p style="margin-bottom: 20px;">I can help you with education-related questions. Try asking about:</p>
-
-<div style="background: linear-gradient(to right, #dbeafe, #f0f9ff); padding: 15px; border-radius: 8px; margin: 15px 0;">
-<p style="color: #1e3a8a;">• Schools with high low-income students and low tech spending</p>
-</div>
+                response_text = "".join((
+                    FALLBACK_PREFIX, html.escape(message), FALLBACK_MID, html.escape(str(e)), FALLBACK_SUFFIX
+                ))
+        
+        logger.info("chat", extra={"fields": {
+            "event": "chat",
+            "endpoint": "/chat",
+            "user_role": user_role,
+            "query_type": query_type or "general",
+            "cache_hit": cache_hit,
+            "cached_content_token_count": cached_content_token_count,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "response_chars": len(response_text),
+        }})
+        
+        # Serialize the (multi-KB) HTML answer with orjson and skip response_model validation;
+        # ChatResponse still documents the shape in the OpenAPI schema
+        return ORJSONResponse({
+            "response": response_text,
+            "user_type": user_role,
+            "status": "success"
+        })
+        
+    except Exception as e:
+        logger.exception("❌ Error: %s", e)
+        return ORJSONResponse({
+            "response": f"I apologize, but I encountered an error processing your request: {str(e)}",
+            "user_type": None,
+            "status": "error"
+        })
 
-<div style="background: linear-gradient(to right, #fef3c7, #fef9c3); padding: 15px; border-radius: 8px; margin: 15px 0;">
-<p style="color: #78350f;">• Schools with high graduation rates despite low funding</p>
-</div>
+@app.post("/chat/stream")
+async def chat_stream(
+    message: str = Form(..., max_length=MAX_MESSAGE_CHARS),
+    user_role: str = Form(..., max_length=32),
+    file: Optional[UploadFile] = File(None)
+):
+    """
+    Streaming chat endpoint (server-sent events)
+    
+    General questions stream Gemini's markdown as `data: {"text": ...}` events while it
+    is generated, so the first words show up long before the answer is complete.
+    Every answer then ends with one `event: html` message carrying the formatted HTML
+    (the same markup /chat returns) and `event: done`. Research questions and cached
+    answers skip straight to the html event. An optional image/PDF is sent to Gemini
+    alongside the question, as in /chat. If initialization or Gemini fails, the html
+    event carries the same fallback guidance /chat returns.
+    """
+    started = time.perf_counter()
+    user_role = _detect_user_type(user_role, default=user_role)
+    query_type = _research_query_type(message)
+    
+    # Read the attachment before the response starts - the upload is closed once the handler returns
+    file_bytes = await _read_chat_upload(file) if file and not query_type else None
+    file_digest = _file_digest(file_bytes)
+    
+    async def event_stream():
+        cache_hit = False
+        answer_html = None
+        try:
+            # No-op once startup has initialized the system (LAZY_INIT=1 initializes here)
+            await ensure_initialized()
+            
+            if query_type:
+                answer_html = await _canned_response(query_type, message, user_role, tool_context)
+            else:
+                cache_key = _response_cache_key(message, user_role, file_digest)
+                answer_html = _response_cache.get(cache_key)
+                cache_hit = answer_html is not None
+                
+                if answer_html is None:
+                    client = _require_genai_client()
+                    contents = await _general_contents(message, user_role, file, file_bytes, file_digest)
+                    
+                    parts = []
+                    async for chunk in await client.aio.models.generate_content_stream(
+                        model='gemini-2.5-flash',
+                        contents=contents
+                    ):
+                        if chunk.text:
+                            parts.append(chunk.text)
+                            yield f"data: {json.dumps({'text': chunk.text})}\n\n"
+                    
+                    # Render the complete markdown once (tables/lists need the whole document)
+                    answer_html = "".join((ANSWER_PREFIX, _render_markdown("".join(parts)), ANSWER_SUFFIX))
+                    if not TIME_SENSITIVE_RE.search(message):
+                        _response_cache[cache_key] = answer_html
+        except Exception as e:
+            logger.exception("⚠️ Streaming error: %s", e)
+            
+            # Same guidance /chat shows; the html event also replaces any partially streamed text
+            answer_html = "".join((
+                FALLBACK_PREFIX, html.escape(message), FALLBACK_MID, html.escape(str(e)), FALLBACK_SUFFIX
+            ))
+        
+        yield f"event: html\ndata: {json.dumps({'html': answer_html})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+        
+        logger.info("chat", extra={"fields": {
+            "event": "chat",
+            "endpoint": "/chat/stream",
+            "user_role": user_role,
+            "query_type": query_type or "general",
+            "cache_hit": cache_hit,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "response_chars": len(answer_html),
+        }})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-<div style="background: linear-gradient(to right, #e9d5ff, #f3e8ff); padding: 15px; border-radius: 8px; margin: 15px 0;">
-<p style="color: #581c87;">• Schools with strong STEM programs and low class sizes</p>
-</div>
+# Caps concurrent Gemini enrichment calls across all /match_schools requests in this worker
+_enrichment_semaphore = asyncio.Semaphore(5)
 
-<p style="margin-top: 20px; color: #4b5563;"><strong>Your question:</strong> "{message}"</p>
-<p style="color: #ef4444; margin-top: 10px;">Error: {str(e)}</p>
-</div>"""
-        
-        print(f"✅ Response generated ({len(response_text)} chars)")
-        
-        return ChatResponse(
-            response=response_text,
-            user_type=user_role,
-            status="success"
-        )
-        
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        import traceback
-        traceback.print_exc()
-        return ChatResponse(
-            response=f"I apologize, but I encountered an error processing your request: {str(e)}",
-            status="error"
-        )
+async def _enrich_school_async(school: Dict[str, Any], api_key: Optional[str]) -> Dict[str, Any]:
+    """Enrich one school in a worker thread, bounded by the enrichment semaphore"""
+    async with _enrichment_semaphore:
+        return await asyncio.to_thread(enrich_school, school, api_key)
 
 @app.post("/match_schools")
 async def match_schools_endpoint(
-    message: str = Form(None),
+    message: str = Form(None, max_length=MAX_MESSAGE_CHARS),
     file: Optional[UploadFile] = File(None)
 ):
     """
@@ -375,21 +813,13 @@ async def match_schools_endpoint(
     
     Returns: Top 10 matched schools with scores and application strategy
     """
+    started = time.perf_counter()
     try:
-        # Import the school matching tools
-        from mcp_servers.tools.student_profile import create_student_profile
-        from mcp_servers.tools.school_matcher import (
-            match_schools,
-            rank_schools,
-            generate_school_recommendations
-        )
-        from mcp_servers.tools.school_enrichment import enrich_multiple_schools
-        
-        print(f"\n🏫 School Match Request")
+        logger.info("🏫 School Match Request")
         if file:
-            print(f"   📎 File: {file.filename} ({file.content_type})")
+            logger.debug("📎 File: %s (%s)", file.filename, file.content_type)
         if message:
-            print(f"   💬 Message: {message[:100]}...")
+            logger.debug("💬 Message: %.100s...", message)
         
         # Get config
         config_obj = get_config()
@@ -398,18 +828,17 @@ async def match_schools_endpoint(
         file_bytes = None
         mime_type = None
         if file:
-            file_bytes = await file.read()
+            # Size-checked read - oversize uploads are rejected without buffering them
+            file_bytes = await _read_upload(file, 20)
             mime_type = file.content_type
-            file_size_mb = len(file_bytes) / (1024 * 1024)
-            print(f"   📊 File size: {file_size_mb:.2f}MB")
-            
-            # Validate file size
-            if file_size_mb > 20:
-                raise HTTPException(status_code=400, detail="File too large. Max 20MB.")
+            logger.debug("📊 File size: %.2fMB", len(file_bytes) / (1024 * 1024))
+        
+        # Blocking Gemini/BigQuery steps run in worker threads so other requests keep being served
         
         # Step 1: Create student profile
-        print("   🔍 Creating student profile...")
-        student_profile = create_student_profile(
+        logger.debug("🔍 Creating student profile...")
+        student_profile = await asyncio.to_thread(
+            create_student_profile,
             text_input=message if message else None,
             file_bytes=file_bytes,
             mime_type=mime_type,
@@ -420,14 +849,15 @@ async def match_schools_endpoint(
             return {
                 "status": "error",
                 "message": student_profile.get("message", "Failed to create student profile"),
-                "html": f"<div style='padding: 20px; color: #ef4444;'>Error: {student_profile.get('message')}</div>"
+                "html": f"<div style='padding: 20px; color: #ef4444;'>Error: {html.escape(str(student_profile.get('message')))}</div>"
             }
         
-        print(f"   ✅ Profile created: Grade {student_profile.get('grade_entering', 'unknown')}, {student_profile.get('school_level_name', 'unknown')}")
+        logger.debug("✅ Profile created: Grade %s, %s", student_profile.get('grade_entering', 'unknown'), student_profile.get('school_level_name', 'unknown'))
         
         # Step 2: Match schools
-        print("   🔎 Matching schools from BigQuery...")
-        match_result = match_schools(
+        logger.debug("🔎 Matching schools from BigQuery...")
+        match_result = await asyncio.to_thread(
+            match_schools,
             student_profile=student_profile,
             project_id=config_obj.project_id,
             dataset=config_obj.bigquery_dataset,
@@ -438,34 +868,39 @@ async def match_schools_endpoint(
             return {
                 "status": "error",
                 "message": match_result.get("message", "No schools found"),
-                "html": f"<div style='padding: 20px;'><h3>No Schools Found</h3><p>{match_result.get('message')}</p></div>"
+                "html": f"<div style='padding: 20px;'><h3>No Schools Found</h3><p>{html.escape(str(match_result.get('message')))}</p></div>"
             }
         
-        print(f"   ✅ Found {len(match_result['schools'])} schools")
+        logger.debug("✅ Found %d schools", len(match_result['schools']))
         
         # Step 3: Rank schools
-        print("   📊 Ranking schools...")
+        logger.debug("📊 Ranking schools...")
         ranked = rank_schools(
             schools=match_result["schools"],
-            student_profile=student_profile
+            student_profile=student_profile,
+            top_k=10  # Only the top 10 are enriched and shown
         )
         
-        # Step 4: Enrich schools with detailed information (top 10)
-        print("   🔍 Enriching top 10 schools with tours, deadlines, and program details...")
-        enriched_schools = enrich_multiple_schools(
-            schools=ranked[:10],
-            api_key=os.getenv("GOOGLE_API_KEY"),
-            max_schools=10  # Full enrichment for all top 10
+        # Step 4: Enrich schools with detailed information (top 10), all schools at once
+        logger.debug("🔍 Enriching top 10 schools with tours, deadlines, and program details...")
+        api_key = os.getenv("GOOGLE_API_KEY")
+        enriched_schools = await asyncio.gather(
+            *(_enrich_school_async(school, api_key) for school in ranked[:10])
         )
         
         # Step 5: Generate recommendations
-        print("   🎯 Generating recommendations...")
+        logger.debug("🎯 Generating recommendations...")
         recommendations = generate_school_recommendations(
             ranked_schools=enriched_schools,
             student_profile=student_profile
         )
         
-        print(f"   ✅ Top 10 schools ranked and enriched")
+        logger.info("match_schools", extra={"fields": {
+            "event": "match_schools",
+            "endpoint": "/match_schools",
+            "schools_matched": len(match_result["schools"]),
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }})
         
         # Step 5: Format as compact cards (new layout)
         html_response = _format_school_matches_compact_cards(recommendations)
@@ -478,402 +913,73 @@ async def match_schools_endpoint(
         }
         
     except Exception as e:
-        print(f"   ❌ Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error: %s", e)
         return {
             "status": "error",
             "message": str(e),
-            "html": f"<div style='padding: 20px; color: #ef4444;'><h3>Error</h3><p>{str(e)}</p></div>"
+            "html": f"<div style='padding: 20px; color: #ef4444;'><h3>Error</h3><p>{html.escape(str(e))}</p></div>"
         }
 
+# Enrichment lists as sliced by showSchoolDetails() in static/index.html
+CLIENT_ENRICHMENT_LIMITS = (("tours", 2), ("deadlines", 3), ("requirements", 5), ("programs", 4))
+
+def _client_school_data(school: Dict[str, Any]) -> Dict[str, Any]:
+    """Project a ranked school down to the fields the "View Details" panel reads"""
+    slim = {
+        "ncessch": school.get("ncessch"),
+        "match_reasoning": (school.get("match_reasoning") or [])[:5],
+    }
+    enrichment = school.get("enrichment")
+    if enrichment:
+        slim_enrichment = {"status": enrichment.get("status")}
+        for key, limit in CLIENT_ENRICHMENT_LIMITS:
+            if enrichment.get(key):
+                slim_enrichment[key] = enrichment[key][:limit]
+        contact = enrichment.get("contact")
+        if contact:
+            slim_enrichment["contact"] = {"phone": contact.get("phone"), "website": contact.get("website")}
+        slim["enrichment"] = slim_enrichment
+    return slim
+
 def _format_school_matches_compact_cards(recommendations: Dict[str, Any]) -> str:
     """
     Format school matches to match Figma design exactly.
     """
     if recommendations.get("status") != "success":
-        return f"<div style='padding: 20px;'><p>{recommendations.get('message', 'No recommendations available')}</p></div>"
+        return f"<div style='padding: 20px;'><p>{html.escape(str(recommendations.get('message', 'No recommendations available')))}</p></div>"
     
     top_schools = recommendations.get("top_10", [])
     
-    # Header with gradient text and action button
-    html = f"""
-    <div style="padding: 0; margin: 0;">
-        <!-- Header -->
-        <div style="display: flex; flex-direction: column; gap: 1rem; margin-bottom: 1.5rem;">
-            <div style="display: flex; justify-content: space-between; align-items: start; flex-wrap: wrap; gap: 1rem;">
-                <div>
-                    <h2 style="font-size: 1.5rem; font-weight: 700; background: linear-gradient(to right, #2563eb, #4f46e5, #7c3aed); -webkit-background-clip: text; -webkit-text-fill-color: transparent; background-clip: text; display: flex; align-items: center; gap: 0.5rem; margin: 0 0 0.5rem 0;">
-                        <svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="#4f46e5" stroke-width="2" style="flex-shrink: 0;">
-                            <path d="M12 3l1.912 5.813a2 2 0 001.272 1.272L21 12l-5.813 1.912a2 2 0 00-1.272 1.272L12 21l-1.912-5.813a2 2 0 00-1.272-1.272L3 12l5.813-1.912a2 2 0 001.272-1.272L12 3z"></path>
-                        </svg>
-                        Recommended Schools for Your Child
-                    </h2>
-                    <p style="color: #64748b; margin: 0; font-size: 0.875rem;">Based on your description, here are the top {len(top_schools)} matching schools • Includes both public and charter options</p>
-                </div>
-                <button onclick="window.location.reload()" style="padding: 0.625rem 1.25rem; background: white; border: 1px solid #cbd5e1; border-radius: 0.5rem; color: #475569; font-size: 0.875rem; font-weight: 500; cursor: pointer; display: flex; align-items: center; gap: 0.5rem; transition: all 0.2s;"
-                        onmouseover="this.style.background='#f8fafc'" onmouseout="this.style.background='white'">
-                    <svg width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
-                        <circle cx="11" cy="11" r="8"></circle>
-                        <path d="m21 21-4.35-4.35"></path>
-                    </svg>
-                    New Search
-                </button>
-            </div>
-        </div>
-
-        <!-- School Cards Grid -->
-        <div style="display: grid; grid-template-columns: repeat(auto-fill, minmax(340px, 1fr)); gap: 1rem;">
-    """
-    
+    cards = []
     for i, school in enumerate(top_schools, 1):
         match_score = school.get("match_score", 0)
-        school_id = school.get('ncessch', f'school_{i}')
-        
-        # Determine gradient color (using actual hex values)
-        if match_score >= 90:
-            color1, color2 = "#10b981", "#22c55e"  # emerald to green
-            badge_text = "Match"
-        elif match_score >= 80:
-            color1, color2 = "#3b82f6", "#06b6d4"  # blue to cyan
-            badge_text = "Match"
-        elif match_score >= 70:
-            color1, color2 = "#f59e0b", "#fb923c"  # amber to orange
-            badge_text = "Match"
-        else:
-            color1, color2 = "#ef4444", "#f43f5e"  # red to rose
-            badge_text = "Match"
         
-        grad_rate = school.get('graduation_rate')
-        grad_display = f"{grad_rate}%" if grad_rate else "N/A"
+        # Badge gradient comes from the match-badge-<tier> class in index.html
+        badge_tier = next(tier for floor, tier in MATCH_BADGE_TIERS if match_score >= floor)
         
-        html += f'''
-        <div class="school-card-{school_id}" style="background: white; border-radius: 1rem; border: 1px solid #e2e8f0; overflow: hidden; box-shadow: 0 2px 4px -1px rgba(0, 0, 0, 0.06); transition: all 0.3s; position: relative; height: 100%;" 
-             onmouseover="this.style.boxShadow='0 20px 25px -5px rgba(0, 0, 0, 0.1), 0 10px 10px -5px rgba(0, 0, 0, 0.04)'"
-             onmouseout="this.style.boxShadow='0 2px 4px -1px rgba(0, 0, 0, 0.06)'">
-            
-            <!-- Match Score Badge (Top Right) -->
-            <div style="position: absolute; top: 0.75rem; right: 0.75rem; z-index: 10;">
-                <div style="background: linear-gradient(135deg, {color1}, {color2}); color: white; padding: 0.375rem 0.75rem; border-radius: 9999px; font-size: 0.875rem; font-weight: 600; box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.2); display: flex; align-items: center; gap: 0.25rem;">
-                    <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2.5">
-                        <path d="M12 2l3.09 6.26L22 9.27l-5 4.87 1.18 6.88L12 17.77l-6.18 3.25L7 14.14 2 9.27l6.91-1.01L12 2z"></path>
-                    </svg>
-                    {match_score}% {badge_text}
-                </div>
-            </div>
-
-            <!-- Favorite Button (Top Left) -->
-            <button onclick="toggleFavorite(this)" style="position: absolute; top: 0.75rem; left: 0.75rem; z-index: 10; padding: 0.5rem; background: rgba(255, 255, 255, 0.9); backdrop-filter: blur(4px); border: none; border-radius: 9999px; cursor: pointer; box-shadow: 0 2px 4px -1px rgba(0, 0, 0, 0.1); transition: all 0.2s;"
-                    onmouseover="this.style.background='white'; this.style.boxShadow='0 4px 6px -1px rgba(0, 0, 0, 0.15)'"
-                    onmouseout="this.style.background='rgba(255, 255, 255, 0.9)'; this.style.boxShadow='0 2px 4px -1px rgba(0, 0, 0, 0.1)'">
-                <svg width="16" height="16" viewBox="0 0 24 24" fill="none" stroke="#94a3b8" stroke-width="2" class="heart-icon">
-                    <path d="M20.84 4.61a5.5 5.5 0 0 0-7.78 0L12 5.67l-1.06-1.06a5.5 5.5 0 0 0-7.78 7.78l1.06 1.06L12 21.23l7.78-7.78 1.06-1.06a5.5 5.5 0 0 0 0-7.78z"></path>
-                </svg>
-            </button>
-            
-            <!-- Content -->
-            <div style="padding: 3.5rem 1.25rem 1.25rem;">
-                    <div style="margin-bottom: 1rem;">
-                        <h3 style="font-size: 1.125rem; font-weight: 700; color: #0f172a; margin: 0 0 0.5rem 0; line-height: 1.375;">{school.get('school_name', 'Unknown School')}</h3>
-                        <div style="display: flex; align-items: center; gap: 0.5rem; flex-wrap: wrap; margin-bottom: 0.25rem;">
-                            <span style="background: {'#3b82f6' if school.get('charter') == 1 else '#10b981'}; color: white; padding: 0.125rem 0.5rem; border-radius: 0.25rem; font-size: 0.75rem; font-weight: 600;">
-                                {'CHARTER' if school.get('charter') == 1 else 'PUBLIC'}
-                            </span>
-                            <div style="display: flex; align-items: center; gap: 0.25rem; color: #64748b; font-size: 0.875rem;">
-                                <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
-                                    <path d="M21 10c0 7-9 13-9 13s-9-6-9-13a9 9 0 0 1 18 0z"></path>
-                                    <circle cx="12" cy="10" r="3"></circle>
-                                </svg>
-                                {school.get('district_name', 'Unknown District')}
-                            </div>
-                        </div>
-                    </div>
-
-                <!-- Stats Grid -->
-                <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 0.75rem; padding: 0.75rem 0; border-top: 1px solid #f1f5f9; border-bottom: 1px solid #f1f5f9; margin-bottom: 1rem;">
-                    <div>
-                        <p style="font-size: 0.75rem; color: #94a3b8; margin: 0 0 0.125rem 0;">Graduation Rate</p>
-                        <p style="font-size: 1.125rem; font-weight: 700; color: #0f172a; margin: 0;">{grad_display}</p>
-                    </div>
-                    <div>
-                        <p style="font-size: 0.75rem; color: #94a3b8; margin: 0 0 0.125rem 0;">Students</p>
-                        <p style="font-size: 1.125rem; font-weight: 700; color: #0f172a; margin: 0;">{int(school.get('enrollment', 0)):,}</p>
-                    </div>
-                    <div>
-                        <p style="font-size: 0.75rem; color: #94a3b8; margin: 0 0 0.125rem 0;">Funding/Student</p>
-                        <p style="font-size: 1rem; font-weight: 700; color: #0f172a; margin: 0;">${int(school.get('per_pupil_total', 0) if school.get('per_pupil_total') else 0):,}</p>
-                    </div>
-                    <div>
-                        <p style="font-size: 0.75rem; color: #94a3b8; margin: 0 0 0.125rem 0;">Low Income</p>
-                        <p style="font-size: 1rem; font-weight: 700; color: #0f172a; margin: 0;">{school.get('low_income_pct', 'N/A')}%</p>
-                    </div>
-                </div>
-
-                <!-- View Details Button -->
-                <button onclick="showSchoolDetails('{school_id}')" 
-                        style="width: 100%; background: linear-gradient(135deg, #2563eb 0%, #4f46e5 100%); color: white; padding: 0.625rem 1rem; border: none; border-radius: 0.5rem; font-size: 0.875rem; font-weight: 600; cursor: pointer; display: flex; align-items: center; justify-content: center; gap: 0.5rem; box-shadow: 0 4px 6px -1px rgba(37, 99, 235, 0.3); transition: all 0.2s;"
-                        onmouseover="this.style.background='linear-gradient(135deg, #1d4ed8 0%, #4338ca 100%)'; this.style.boxShadow='0 10px 15px -3px rgba(37, 99, 235, 0.4)'"
-                        onmouseout="this.style.background='linear-gradient(135deg, #2563eb 0%, #4f46e5 100%)'; this.style.boxShadow='0 4px 6px -1px rgba(37, 99, 235, 0.3)'">
-                    View Details
-                    <svg width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2">
-                        <path d="M18 13v6a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2V8a2 2 0 0 1 2-2h6"></path>
-                        <polyline points="15 3 21 3 21 9"></polyline>
-                        <line x1="10" y1="14" x2="21" y2="3"></line>
-                    </svg>
-                </button>
-            </div>
-            
-            <!-- Details Section (Hidden by default) -->
-            <div id="details-{school_id}" style="display: none; padding: 1.25rem; border-top: 1px solid #f1f5f9; background: #f8fafc;"></div>
-        </div>
-        '''
-    
-    html += '</div></div>'  # Close grid
-    
-    # Add school data and JavaScript
-    import json
-    schools_json = json.dumps(top_schools, default=str)
-    
-    html += f'''
-    <script>
-        // Set global school data for use by the global functions
-        window.schoolsData = {schools_json};
-    </script>
-    '''
-    
-    return html
-
-def _format_school_matches_html(recommendations: Dict[str, Any]) -> str:
-    """
-    Format school recommendations as beautiful HTML.
-    """
-    if recommendations.get("status") != "success":
-        return f"<div style='padding: 20px;'><p>{recommendations.get('message', 'No recommendations available')}</p></div>"
-    
-    top_schools = recommendations.get("top_10", [])
-    strategy = recommendations.get("application_strategy", {})
-    
-    html = """
-    <div style="padding: 20px; max-width: 1200px; margin: 0 auto;">
-        <h1 style="color: #1f2937; margin-bottom: 10px;">🏫 Your Personalized School Matches</h1>
-        <p style="color: #6b7280; margin-bottom: 30px; font-size: 1.1rem;">
-            Found {count} schools matching your child's profile. Here are your top 10 recommendations:
-        </p>
-    """.format(count=len(top_schools))
-    
-    # Add application strategy box
-    if strategy:
-        html += """
-        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 12px; margin-bottom: 30px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-            <h2 style="margin-top: 0; font-size: 1.3rem;">📋 Your Application Strategy</h2>
-            <p style="font-size: 1.05rem; line-height: 1.6;">{approach}</p>
-            <div style="margin-top: 15px;">
-                <strong>Next Steps:</strong>
-                <ul style="margin-top: 10px;">
-        """.format(approach=strategy.get("recommended_approach", ""))
-        
-        for step in strategy.get("next_steps", [])[:4]:
-            html += f"<li style='margin: 8px 0;'>{step}</li>"
-        
-        html += """
-                </ul>
-            </div>
-        </div>
-        """
-    
-    # Add school cards
-    for i, school in enumerate(top_schools, 1):
-        match_score = school.get("match_score", 0)
+        grad_rate = school.get('graduation_rate')
         
-        # Determine color based on score
-        if match_score >= 85:
-            color = "#10b981"
-            badge = "🌟 Excellent Match"
-        elif match_score >= 70:
-            color = "#3b82f6"
-            badge = "✅ Good Match"
-        elif match_score >= 50:
-            color = "#f59e0b"
-            badge = "⚠️ Fair Match"
-        else:
-            color = "#6b7280"
-            badge = "💭 Consider"
-        
-        html += f"""
-        <div style="background: white; border-left: 5px solid {color}; padding: 20px; margin-bottom: 20px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-            <div style="display: flex; justify-content: space-between; align-items: start; margin-bottom: 15px;">
-                <div>
-                    <span style="background: {color}; color: white; padding: 4px 12px; border-radius: 20px; font-size: 0.85rem; font-weight: 600;">#{i}</span>
-                    <h3 style="margin: 10px 0 5px 0; color: #1f2937; font-size: 1.4rem;">{school.get('school_name', 'Unknown School')}</h3>
-                    <p style="color: #6b7280; margin: 0;">
-                        📍 {school.get('city_location', 'Unknown')}, CA<br>
-                        <span style="font-size: 0.85rem;">District: {school.get('district_name', 'Unknown District')}</span>
-                    </p>
-                </div>
-                <div style="text-align: right;">
-                    <div style="font-size: 2rem; font-weight: bold; color: {color};">{match_score}%</div>
-                    <div style="color: {color}; font-size: 0.9rem; font-weight: 600;">{badge}</div>
-                </div>
-            </div>
-            
-            <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 15px; margin: 15px 0; padding: 15px; background: #f9fafb; border-radius: 6px;">
-                <div>
-                    <div style="color: #6b7280; font-size: 0.85rem;">Student-Teacher Ratio</div>
-                    <div style="font-size: 1.1rem; font-weight: 600; color: #1f2937;">{school.get('student_teacher_ratio', 'N/A')}:1</div>
-                </div>
-                <div>
-                    <div style="color: #6b7280; font-size: 0.85rem;">Enrollment</div>
-                    <div style="font-size: 1.1rem; font-weight: 600; color: #1f2937;">{int(school.get('enrollment', 0))} students</div>
-                </div>
-        """
-        
-        # Add graduation rate for high schools
-        if school.get('graduation_rate'):
-            html += f"""
-                <div>
-                    <div style="color: #6b7280; font-size: 0.85rem;">Graduation Rate</div>
-                    <div style="font-size: 1.1rem; font-weight: 600; color: #1f2937;">{school.get('graduation_rate', 'N/A')}%</div>
-                </div>
-            """
-        
-        # Add AP courses if available (only for high schools with valid data)
-        ap_courses = school.get('ap_courses', 0)
-        if school.get('school_level') == 3 and ap_courses and ap_courses > 0:
-            html += f"""
-                <div>
-                    <div style="color: #6b7280; font-size: 0.85rem;">AP Courses</div>
-                    <div style="font-size: 1.1rem; font-weight: 600; color: #1f2937;">{int(ap_courses)} offered</div>
-                </div>
-            """
-        
-        html += """
-            </div>
-            
-            <div style="margin-top: 15px;">
-                <strong style="color: #1f2937;">Why This School Matches:</strong>
-                <ul style="margin-top: 8px; padding-left: 20px;">
-        """
-        
-        for reason in school.get('match_reasoning', [])[:5]:
-            html += f"<li style='margin: 5px 0; color: #374151;'>{reason}</li>"
-        
-        html += f"""
-                </ul>
-            </div>
-            """
-        
-        # Add enriched information if available
-        enrichment = school.get('enrichment', {})
-        if enrichment and enrichment.get('status') == 'success':
-            # Tours Section
-            tours = enrichment.get('tours', [])
-            if tours:
-                html += """
-            <div style="margin-top: 20px; padding: 15px; background: #fef3c7; border-left: 4px solid #f59e0b; border-radius: 6px;">
-                <h4 style="margin: 0 0 10px 0; color: #92400e; font-size: 1rem;">📅 Upcoming Tours & Events</h4>
-                """
-                for tour in tours[:2]:
-                    tour_type = tour.get('type', 'Event')
-                    date = tour.get('date', tour.get('schedule', 'TBD'))
-                    time = tour.get('time', '')
-                    registration = tour.get('registration', 'Contact school')
-                    html += f"""
-                <div style="margin-bottom: 8px;">
-                    <strong style="color: #78350f;">{tour_type}:</strong> {date} {time}<br>
-                    <span style="font-size: 0.9rem; color: #92400e;">Registration: {registration}</span>
-                </div>
-                    """
-                html += "</div>"
-            
-            # Deadlines Section
-            deadlines = enrichment.get('deadlines', [])
-            if deadlines:
-                html += """
-            <div style="margin-top: 15px; padding: 15px; background: #fecaca; border-left: 4px solid #ef4444; border-radius: 6px;">
-                <h4 style="margin: 0 0 10px 0; color: #7f1d1d; font-size: 1rem;">📋 Important Deadlines</h4>
-                """
-                for deadline in deadlines[:3]:
-                    deadline_type = deadline.get('type', 'Deadline')
-                    date = deadline.get('date', 'TBD')
-                    notes = deadline.get('notes', '')
-                    html += f"""
-                <div style="margin-bottom: 8px;">
-                    <strong style="color: #991b1b;">{deadline_type}:</strong> {date}<br>
-                    <span style="font-size: 0.9rem; color: #7f1d1d;">{notes}</span>
-                </div>
-                    """
-                html += "</div>"
-            
-            # Requirements Section
-            requirements = enrichment.get('requirements', [])
-            if requirements:
-                html += """
-            <div style="margin-top: 15px; padding: 15px; background: #e0e7ff; border-left: 4px solid: #3b82f6; border-radius: 6px;">
-                <h4 style="margin: 0 0 10px 0; color: #1e3a8a; font-size: 1rem;">📄 Enrollment Requirements</h4>
-                <ul style="margin: 0; padding-left: 20px; color: #1e40af;">
-                """
-                for req in requirements[:4]:
-                    html += f"<li style='margin: 5px 0; font-size: 0.9rem;'>{req}</li>"
-                html += """
-                </ul>
-            </div>
-                """
-            
-            # Programs Section
-            programs = enrichment.get('programs', [])
-            if programs:
-                html += """
-            <div style="margin-top: 15px; padding: 15px; background: #d1fae5; border-left: 4px solid #10b981; border-radius: 6px;">
-                <h4 style="margin: 0 0 10px 0; color: #065f46; font-size: 1rem;">🎯 Programs & Services</h4>
-                """
-                for program in programs[:4]:
-                    prog_name = program.get('name', 'Program')
-                    prog_desc = program.get('description', '')
-                    html += f"""
-                <div style="margin-bottom: 8px;">
-                    <strong style="color: #047857;">{prog_name}:</strong> <span style="font-size: 0.9rem; color: #065f46;">{prog_desc}</span>
-                </div>
-                    """
-                html += "</div>"
-            
-            # Contact Section
-            contact = enrichment.get('contact', {})
-            if contact:
-                phone = contact.get('phone', '')
-                email = contact.get('email', '')
-                website = contact.get('website', '')
-                hours = contact.get('office_hours', '')
-                
-                html += f"""
-            <div style="margin-top: 15px; padding: 15px; background: #f3f4f6; border-left: 4px solid #6b7280; border-radius: 6px;">
-                <h4 style="margin: 0 0 10px 0; color: #374151; font-size: 1rem;">📞 Contact Information</h4>
-                <div style="font-size: 0.9rem; color: #4b5563;">
-                    {f'<div style="margin: 4px 0;"><strong>Phone:</strong> {phone}</div>' if phone else ''}
-                    {f'<div style="margin: 4px 0;"><strong>Email:</strong> {email}</div>' if email else ''}
-                    {f'<div style="margin: 4px 0;"><strong>Website:</strong> {website}</div>' if website else ''}
-                    {f'<div style="margin: 4px 0;"><strong>Office Hours:</strong> {hours}</div>' if hours else ''}
-                </div>
-            </div>
-                """
-        
-        html += """
-            <div style="margin-top: 15px; padding-top: 15px; border-top: 1px solid #e5e7eb;">
-                <span style="background: #e0e7ff; color: #3730a3; padding: 6px 12px; border-radius: 6px; font-size: 0.9rem; font-weight: 500;">
-                    """ + school.get('admission_type', 'Unknown') + """
-                </span>
-            </div>
-        </div>
-        """
+        cards.append({
+            "school_id": school.get('ncessch', f'school_{i}'),
+            "match_score": match_score,
+            "badge_tier": badge_tier,
+            "badge_text": "Match",
+            "school_name": school.get('school_name', 'Unknown School'),
+            "district_name": school.get('district_name', 'Unknown District'),
+            "charter": school.get('charter') == 1,
+            "grad_display": f"{grad_rate}%" if grad_rate else "N/A",
+            "enrollment": f"{int(school.get('enrollment', 0)):,}",
+            "funding": f"{int(school.get('per_pupil_total') or 0):,}",
+            "low_income_pct": school.get('low_income_pct', 'N/A'),
+        })
     
-    html += """
-        <div style="margin-top: 40px; padding: 20px; background: #f0f9ff; border-radius: 8px; border: 1px solid #bae6fd;">
-            <h3 style="color: #0c4a6e; margin-top: 0;">💡 All Information Provided Above</h3>
-            <p style="color: #075985;">Each school card above includes complete details about tours, deadlines, requirements, and programs - no need to contact them separately! Just scroll up to see all the information.</p>
-        </div>
-    </div>
-    """
+    # School data for the global showSchoolDetails() handler, trimmed to what it reads;
+    # "</" is escaped so a value can't close the <script> block early
+    client_schools = [_client_school_data(school) for school in top_schools]
+    schools_json = orjson.dumps(client_schools, default=str, option=SCHOOLS_JSON_OPTIONS).decode().replace("</", "<\\/")
     
-    return html
+    # Markup lives in templates/school_match_cards.html (compiled once, autoescaped)
+    return SCHOOL_CARDS_TEMPLATE.render(cards=cards, schools_json=schools_json)
 
 if __name__ == "__main__":
     import uvicorn
@@ -881,8 +987,19 @@ if __name__ == "__main__":
     # Get port from environment or default to 8080
     port = int(os.getenv("PORT", "8080"))
     
-    print(f"🌐 Starting Education Insights API on port {port}...")
-    print(f"📊 Chat UI: http://localhost:{port}")
-    print(f"🔧 API docs: http://localhost:{port}/docs")
+    logger.info("🌐 Starting Education Insights API on port %d...", port)
+    logger.info("📊 Chat UI: http://localhost:%d", port)
+    logger.info("🔧 API docs: http://localhost:%d/docs", port)
     
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # One worker per CPU (override with WEB_CONCURRENCY); each worker keeps its own caches.
+    # uvloop/httptools come with uvicorn[standard]; access logging is covered by the "chat" log records
+    uvicorn.run(
+        "api:app",
+        host="0.0.0.0",
+        port=port,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        access_log=False,
+        log_level="warning"  # App logging goes through the "api" logger
+    )
@@ -110,6 +110,7 @@ echo "🌐 Service URL: ${SERVICE_URL}"
 echo ""
 echo "Test endpoints:"
 echo "  Health: ${SERVICE_URL}/health"
+echo "  Ready:  ${SERVICE_URL}/ready"
 echo "  Chat UI: ${SERVICE_URL}/"
 echo "  API Docs: ${SERVICE_URL}/docs"
 echo ""
@@ -4,12 +4,16 @@ Education Insights & Resource Recommender
 Main entry point for ADK-based hierarchical agent system
 
 Run:
-    python main.py --demo    # Demo with sample queries
-    python main.py           # Interactive mode
+    python main.py --demo        # Demo with sample queries
+    python main.py --warm-cache  # Pre-run the 3 research queries as BATCH jobs (off-peak)
+    python main.py               # Interactive mode
 """
 
+import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 from typing import Dict, Any
 
 # Check if running in Cloud Shell (ADK available)
@@ -26,6 +30,8 @@ except ImportError:
 from agents.root_agent import create_root_agent
 from agents.config import get_config
 
+logger = logging.getLogger(__name__)
+
 
 def create_runner_state() -> State:
     """Create initial state for the agent runner"""
@@ -75,24 +81,25 @@ def run_demo_mode():
     from tools.bigquery_tools import (
         find_high_need_low_tech_spending,
         find_high_graduation_low_funding,
-        find_strong_stem_low_class_size
+        find_strong_stem_low_class_size,
+        get_bigquery_client
     )
     
     config = get_config()
     
-    # Create mock ToolContext for testing
-    class MockState:
-        def __init__(self, project_id, dataset):
-            self.project_id = project_id
-            self.dataset = dataset
-        def get(self, key, default=None):
-            return getattr(self, key, default)
-    
-    class MockContext:
-        def __init__(self, project_id, dataset):
-            self.state = MockState(project_id, dataset)
+    # Stand-in ToolContext, as in api.py: the tools only read project/dataset from
+    # .state (and record last-query stats in it)
+    mock_ctx = SimpleNamespace(state={
+        "project_id": config.project_id,
+        "bigquery_dataset": config.bigquery_dataset
+    })
     
-    mock_ctx = MockContext(config.project_id, config.bigquery_dataset)
+    # Build and authenticate the shared BigQuery client once, before the three
+    # queries fan out - they all reuse it through get_bigquery_client()
+    try:
+        get_bigquery_client(config.project_id)
+    except Exception as e:
+        logger.warning("⚠️  BigQuery client setup failed: %s", e)
     
     # Demo queries matching the 3 research questions
     demo_queries = [
@@ -125,29 +132,34 @@ def run_demo_mode():
         }
     ]
     
-    for i, demo in enumerate(demo_queries, 1):
-        print(f"\n{'─' * 70}")
-        print(f"{demo['emoji']} {demo['title']} ({i}/{len(demo_queries)})")
-        print(f"{'─' * 70}")
-        print(f"📝 {demo['description']}\n")
+    # The three BigQuery lookups are independent - run them side by side and
+    # print the results in order as each one is needed
+    with ThreadPoolExecutor(max_workers=len(demo_queries)) as executor:
+        futures = [executor.submit(demo['function']) for demo in demo_queries]
         
-        try:
-            # Run the query
-            result = demo['function']()
+        for i, (demo, future) in enumerate(zip(demo_queries, futures), 1):
+            print(f"\n{'─' * 70}")
+            print(f"{demo['emoji']} {demo['title']} ({i}/{len(demo_queries)})")
+            print(f"{'─' * 70}")
+            print(f"📝 {demo['description']}\n")
             
-            # Print response
-            if result['status'] == 'success':
-                print(f"✅ Found {result.get('count', 0)} schools\n")
-                print(f"📊 Results:")
-                print(result['summary'])
-                print()
-            else:
-                print(f"⚠️  {result.get('message', 'No data found')}\n")
-            
-        except Exception as e:
-            print(f"❌ Error: {str(e)}\n")
-            import traceback
-            traceback.print_exc()
+            try:
+                # Wait for the query
+                result = future.result()
+                
+                # Print response
+                if result['status'] == 'success':
+                    print(f"✅ Found {result.get('count', 0)} schools\n")
+                    print(f"📊 Results:")
+                    print(result['summary'])
+                    print()
+                else:
+                    print(f"⚠️  {result.get('message', 'No data found')}\n")
+                
+            except Exception as e:
+                # Full traceback only with LOG_LEVEL=DEBUG
+                logger.debug("Demo query failed", exc_info=True)
+                print(f"❌ Error: {e.__class__.__name__}: {e}\n")
     
     print(f"\n{'=' * 70}")
     print("✅ Demo complete! Multi-agent system is configured.")
@@ -157,6 +169,31 @@ def run_demo_mode():
     print("=" * 70 + "\n")
 
 
+def run_warm_cache():
+    """Run the 3 research-question queries as BATCH jobs to fill the tool result cache"""
+    from tools.bigquery_tools import run_research_questions_batch
+    
+    config = get_config()
+    ctx = SimpleNamespace(state={
+        "project_id": config.project_id,
+        "bigquery_dataset": config.bigquery_dataset
+    })
+    
+    print("🔥 Warming research-question cache (BATCH priority)...\n")
+    results = run_research_questions_batch(tool_context=ctx)
+    
+    failed = False
+    for query_type, result in results.items():
+        if result.get("status") == "success":
+            print(f"✅ {query_type}: {result.get('row_count', 0)} rows")
+        else:
+            failed = True
+            print(f"❌ {query_type}: {result.get('message', result.get('status'))}")
+    
+    if failed:
+        sys.exit(1)
+
+
 def run_interactive_mode():
     """Run interactive conversation with the user"""
     print_welcome()
@@ -203,23 +240,29 @@ def run_interactive_mode():
             print("\n\n👋 Interrupted. Goodbye!")
             break
         except Exception as e:
-            print(f"\n❌ Error: {str(e)}\n")
-            import traceback
-            traceback.print_exc()
+            # Full traceback only with LOG_LEVEL=DEBUG
+            logger.debug("Interactive query failed", exc_info=True)
+            print(f"\n❌ Error: {e.__class__.__name__}: {e}\n")
             print("\nPlease try again or type 'quit' to exit.\n")
 
 
 def main():
     """Main entry point"""
+    # LOG_LEVEL=DEBUG adds full tracebacks to the one-line query errors
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper(), format="%(levelname)s %(name)s: %(message)s")
+    
     # Check for ADK
     if not ADK_AVAILABLE:
         return
     
     # Parse command line args
     demo_mode = '--demo' in sys.argv or '-d' in sys.argv
+    warm_cache = '--warm-cache' in sys.argv
     
     try:
-        if demo_mode:
+        if warm_cache:
+            run_warm_cache()
+        elif demo_mode:
             run_demo_mode()
         else:
             run_interactive_mode()
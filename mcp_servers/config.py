@@ -35,14 +35,19 @@ SCHOOL_LEVELS = {
     "other": 4          # Mixed/Alternative
 }
 
-# Grade to School Level Mapping
+# Grade to School Level Mapping (lowercase keys - look up through grade_to_level())
 GRADE_TO_LEVEL = {
-    "K": 1, "kindergarten": 1,
+    "k": 1, "kindergarten": 1,
     "1": 1, "2": 1, "3": 1, "4": 1, "5": 1, "first": 1, "second": 1, "third": 1, "fourth": 1, "fifth": 1,
     "6": 2, "7": 2, "8": 2, "sixth": 2, "seventh": 2, "eighth": 2,
     "9": 3, "10": 3, "11": 3, "12": 3, "ninth": 3, "tenth": 3, "eleventh": 3, "twelfth": 3
 }
 
+
+def grade_to_level(grade: str) -> int:
+    """School level (1-3) for a grade like "K", "3" or "ninth"; 0 if unknown"""
+    return GRADE_TO_LEVEL.get(grade.strip().lower(), 0)
+
 # School Categories for Match Quality
 MATCH_CATEGORIES = {
     "excellent": {"min_score": 0.85, "label": "Excellent Match", "color": "#10b981", "emoji": "🌟"},
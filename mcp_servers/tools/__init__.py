@@ -4,7 +4,7 @@ MCP Tools for Parent Services - K-12 School Choice
 
 from .student_profile import parse_student_documents, create_student_profile
 from .school_matcher import match_schools, rank_schools, generate_school_recommendations
-from .school_enrichment import enrich_school_information, enrich_multiple_schools
+from .school_enrichment import enrich_school_information, enrich_school, enrich_multiple_schools
 
 __all__ = [
     "parse_student_documents",
@@ -13,6 +13,7 @@ __all__ = [
     "rank_schools",
     "generate_school_recommendations",
     "enrich_school_information",
+    "enrich_school",
     "enrich_multiple_schools"
 ]
 
@@ -3,8 +3,32 @@ School Information Enrichment Agent
 Uses AI to automatically fetch/generate detailed school information
 """
 import os
+from functools import lru_cache
 from typing import Dict, Any, List
+import concurrent.futures
 import json
+import logging
+import re
+import threading
+import google.genai as genai
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Outermost {...} block in a model reply (strips markdown fences / prose)
+JSON_OBJECT_RE = re.compile(r'\{[\s\S]*\}')
+
+# AI-generated enrichment per school (tours/deadlines change at most weekly)
+_ENRICHMENT_CACHE = TTLCache(maxsize=4096, ttl=7 * 24 * 3600)
+_ENRICHMENT_LOCK = threading.Lock()
+# One lock per school being enriched, so concurrent requests for it wait for a single Gemini call
+_ENRICHMENT_PENDING: Dict[str, threading.Lock] = {}
+
+
+@lru_cache(maxsize=4)
+def _genai_client(api_key: str) -> genai.Client:
+    """Shared Gemini client per API key (reuses its connection pool across schools and requests)"""
+    return genai.Client(api_key=api_key, vertexai=False)
 
 
 def enrich_school_information(
@@ -32,8 +56,6 @@ def enrich_school_information(
         Dictionary with enriched school information
     """
     try:
-        import google.genai as genai
-        
         if not api_key:
             api_key = os.getenv("GOOGLE_API_KEY")
         
@@ -41,7 +63,7 @@ def enrich_school_information(
             # Return default information if no API key
             return _generate_default_information(school_name, school_level, charter)
         
-        client = genai.Client(api_key=api_key, vertexai=False)
+        client = _genai_client(api_key)
         
         # Determine school type
         school_type = "Charter School" if charter == 1 else "Public School"
@@ -101,8 +123,7 @@ Make the information realistic for a California {school_type} {level_name}. For
         response_text = response.text.strip()
         
         # Extract JSON from response
-        import re
-        json_match = re.search(r'\{[\s\S]*\}', response_text)
+        json_match = JSON_OBJECT_RE.search(response_text)
         if json_match:
             response_text = json_match.group(0)
         
@@ -114,7 +135,7 @@ Make the information realistic for a California {school_type} {level_name}. For
         return enriched_data
         
     except Exception as e:
-        print(f"Error enriching school information: {e}")
+        logger.warning("Error enriching school information: %s", e)
         # Return default information on error
         return _generate_default_information(school_name, school_level, charter)
 
@@ -179,6 +200,58 @@ def _generate_default_information(school_name: str, school_level: int, charter:
     }
 
 
+def _cached_enrichment(school: Dict[str, Any], api_key: str = None) -> Dict[str, Any]:
+    """Enrichment for a school, served from the weekly cache keyed by ncessch when possible"""
+    key = school.get('ncessch') or f"{school.get('school_name')}|{school.get('city_location')}"
+    
+    with _ENRICHMENT_LOCK:
+        if key in _ENRICHMENT_CACHE:
+            return dict(_ENRICHMENT_CACHE[key])
+        pending = _ENRICHMENT_PENDING.setdefault(key, threading.Lock())
+    
+    with pending:
+        # Another thread may have filled the entry while we waited
+        with _ENRICHMENT_LOCK:
+            if key in _ENRICHMENT_CACHE:
+                return dict(_ENRICHMENT_CACHE[key])
+        
+        logger.debug("Enriching %s", school.get('school_name', 'Unknown'))
+        enrichment = enrich_school_information(
+            school_name=school.get('school_name', 'Unknown'),
+            school_level=school.get('school_level', 2),
+            city=school.get('city_location', 'California'),
+            charter=school.get('charter', 0),
+            api_key=api_key
+        )
+        
+        with _ENRICHMENT_LOCK:
+            # Defaults (no API key / Gemini error) aren't cached so the next request retries
+            if enrichment.get('source') == 'ai_generated':
+                _ENRICHMENT_CACHE[key] = enrichment
+            _ENRICHMENT_PENDING.pop(key, None)
+    
+    return dict(enrichment)
+
+
+def enrich_school(school: Dict[str, Any], api_key: str = None) -> Dict[str, Any]:
+    """
+    Enrich a single school dictionary in place with tours, deadlines, requirements and programs.
+    
+    Args:
+        school: School dictionary (from match_schools / rank_schools)
+        api_key: Google API key
+        
+    Returns:
+        The same school dictionary with an 'enrichment' entry
+    """
+    try:
+        school['enrichment'] = _cached_enrichment(school, api_key)
+    except Exception as e:
+        logger.warning("⚠️ Error enriching %s: %s", school.get('school_name'), e)
+        school['enrichment'] = {'status': 'error', 'message': str(e)}
+    return school
+
+
 def enrich_multiple_schools(
     schools: List[Dict[str, Any]],
     api_key: str = None,
@@ -195,57 +268,14 @@ def enrich_multiple_schools(
     Returns:
         List of schools with enriched information
     """
-    import concurrent.futures
-    import threading
-    
-    enriched_schools = []
     schools_to_enrich = schools[:max_schools]
     
-    print(f"   🚀 Enriching {len(schools_to_enrich)} schools in parallel...")
+    logger.debug("🚀 Enriching %d schools in parallel...", len(schools_to_enrich))
     
-    def enrich_one_school(school, index):
-        """Helper function to enrich a single school"""
-        try:
-            print(f"   [{index+1}/{len(schools_to_enrich)}] Enriching {school.get('school_name', 'Unknown')}")
-            
-            enrichment = enrich_school_information(
-                school_name=school.get('school_name', 'Unknown'),
-                school_level=school.get('school_level', 2),
-                city=school.get('city_location', 'California'),
-                charter=school.get('charter', 0),
-                api_key=api_key
-            )
-            
-            # Add enrichment data to school
-            school['enrichment'] = enrichment
-            return school
-        except Exception as e:
-            print(f"   ⚠️ Error enriching {school.get('school_name')}: {e}")
-            school['enrichment'] = {'status': 'error', 'message': str(e)}
-            return school
-    
-    # Use ThreadPoolExecutor to make parallel API calls (max 5 concurrent)
+    # Use ThreadPoolExecutor to make parallel API calls (max 5 concurrent);
+    # map() returns results in input order, so no re-sort is needed
     with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        # Submit all enrichment tasks
-        future_to_school = {
-            executor.submit(enrich_one_school, school, i): school 
-            for i, school in enumerate(schools_to_enrich)
-        }
-        
-        # Collect results as they complete
-        for future in concurrent.futures.as_completed(future_to_school):
-            try:
-                enriched_school = future.result()
-                enriched_schools.append(enriched_school)
-            except Exception as e:
-                print(f"   ⚠️ Future exception: {e}")
-                school = future_to_school[future]
-                school['enrichment'] = {'status': 'error'}
-                enriched_schools.append(school)
-    
-    # Sort back to original order
-    enriched_schools.sort(key=lambda s: schools.index(s) if s in schools else 999)
+        enriched_schools = list(executor.map(lambda school: enrich_school(school, api_key), schools_to_enrich))
     
-    print(f"   ✅ Enriched {len(enriched_schools)} schools")
+    logger.debug("✅ Enriched %d schools", len(enriched_schools))
     return enriched_schools
-
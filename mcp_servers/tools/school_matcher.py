@@ -3,9 +3,13 @@ K-12 School Matching Algorithm
 Finds and ranks schools based on student profile and preferences
 """
 from typing import Dict, Any, List, Optional
+import logging
 import math
+from tools.bigquery_client import get_bigquery_client
 from ..config import MATCHING_WEIGHTS, MATCH_CATEGORIES
 
+logger = logging.getLogger(__name__)
+
 
 def match_schools(
     student_profile: Dict[str, Any],
@@ -26,26 +30,8 @@ def match_schools(
         Dictionary with matched schools and metadata
     """
     try:
-        from google.cloud import bigquery
-        import google.auth
-        import subprocess
-        
-        # Get BigQuery client
-        try:
-            result = subprocess.run(
-                ['gcloud', 'auth', 'print-access-token'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            access_token = result.stdout.strip()
-            from google.auth.transport.requests import Request
-            from google.oauth2.credentials import Credentials
-            creds = Credentials(token=access_token)
-            client = bigquery.Client(project=project_id, credentials=creds)
-        except:
-            credentials, _ = google.auth.default()
-            client = bigquery.Client(project=project_id, credentials=credentials)
+        # Shared client (built and authenticated once per process)
+        client = get_bigquery_client(project_id)
         
         # Build query based on student profile
         query = _build_matching_query(
@@ -55,11 +41,13 @@ def match_schools(
             limit=limit
         )
         
-        # Execute query - save full query for debugging
-        with open('/tmp/school_match_query.sql', 'w') as f:
-            f.write(query)
-        print(f"\n=== Query saved to /tmp/school_match_query.sql (length: {len(query)} chars) ===")
+        # Save full query for debugging (only when debug logging is on - keeps disk I/O off the request path)
+        if logger.isEnabledFor(logging.DEBUG):
+            with open('/tmp/school_match_query.sql', 'w') as f:
+                f.write(query)
+            logger.debug("Query saved to /tmp/school_match_query.sql (length: %d chars)", len(query))
         
+        # Execute query
         query_job = client.query(query)
         results = query_job.result()
         
@@ -289,7 +277,8 @@ def _build_matching_query(
 
 def rank_schools(
     schools: List[Dict[str, Any]],
-    student_profile: Dict[str, Any]
+    student_profile: Dict[str, Any],
+    top_k: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     """
     Rank and score schools based on student profile.
@@ -299,6 +288,7 @@ def rank_schools(
     Args:
         schools: List of matched schools from BigQuery
         student_profile: Student profile data
+        top_k: Only return (and build reasoning for) the best top_k schools
         
     Returns:
         Ranked list of schools with scores and reasoning
@@ -307,8 +297,8 @@ def rank_schools(
         location = student_profile.get("location", {})
         home_city = location.get("city", "").upper() if location else ""
         
-        ranked_schools = []
-        
+        # Score every candidate first - it's a couple of arithmetic ops per school
+        scored = []
         for school in schools:
             # Calculate distance-based score (if location provided)
             location_score = 1.0  # Default if no location
@@ -321,7 +311,16 @@ def rank_schools(
             # Adjust base score with location
             base_score = school.get("base_match_score", 0.5)
             adjusted_score = base_score * 0.85 + location_score * 0.15
-            
+            scored.append((round(adjusted_score * 100, 1), adjusted_score, location_score, school))
+        
+        # Sort by adjusted score (stable, so BigQuery's graduation-rate tiebreak is kept)
+        scored.sort(key=lambda x: x[0], reverse=True)
+        if top_k is not None:
+            scored = scored[:top_k]
+        
+        # Copies and reasoning only for the schools that are returned
+        ranked_schools = []
+        for rank, (match_score, adjusted_score, location_score, school) in enumerate(scored, 1):
             # Generate match reasoning
             reasoning = _generate_match_reasoning(school, student_profile, adjusted_score)
             
@@ -330,24 +329,18 @@ def rank_schools(
             
             # Add enriched data
             enriched_school = school.copy()
-            enriched_school["match_score"] = round(adjusted_score * 100, 1)  # Convert to percentage
+            enriched_school["match_score"] = match_score  # Percentage
             enriched_school["match_reasoning"] = reasoning
             enriched_school["admission_type"] = admission_type
             enriched_school["distance_score"] = location_score
+            enriched_school["rank"] = rank
             
             ranked_schools.append(enriched_school)
         
-        # Sort by adjusted score
-        ranked_schools.sort(key=lambda x: x["match_score"], reverse=True)
-        
-        # Add rank
-        for i, school in enumerate(ranked_schools, 1):
-            school["rank"] = i
-        
         return ranked_schools
         
     except Exception as e:
-        print(f"Error ranking schools: {e}")
+        logger.warning("Error ranking schools: %s", e)
         return schools
 
 
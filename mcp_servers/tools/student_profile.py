@@ -4,7 +4,7 @@ Extracts student information from documents or text input
 """
 from typing import Dict, Any, Optional
 from ..utils.document_parser import parse_document_with_gemini, extract_student_info
-from ..config import GRADE_TO_LEVEL
+from ..config import grade_to_level
 
 
 def parse_student_documents(
@@ -114,7 +114,7 @@ def _enrich_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
     else:
         # PRIORITY 2: Determine school level from grade
         grade_entering = profile.get("grade_entering", "").strip().lower()
-        school_level = GRADE_TO_LEVEL.get(grade_entering, 0)
+        school_level = grade_to_level(grade_entering)
         
         # If not found, try parsing numeric grade
         if school_level == 0 and grade_entering:
@@ -7,6 +7,9 @@ from typing import Dict, Any, Optional
 import json
 import re
 
+# Outermost {...} block in a model reply (strips markdown fences / prose)
+JSON_OBJECT_RE = re.compile(r'\{[\s\S]*\}')
+
 
 def parse_document_with_gemini(
     file_bytes: bytes,
@@ -90,7 +93,7 @@ If information is not available, use empty strings or empty arrays. Be specific
         response_text = response.text.strip()
         
         # Try to extract JSON from response (handle markdown code blocks)
-        json_match = re.search(r'\{[\s\S]*\}', response_text)
+        json_match = JSON_OBJECT_RE.search(response_text)
         if json_match:
             response_text = json_match.group(0)
         
@@ -187,7 +190,7 @@ If information is not mentioned, use empty strings or empty arrays."""
         response_text = response.text.strip()
         
         # Try to extract JSON
-        json_match = re.search(r'\{[\s\S]*\}', response_text)
+        json_match = JSON_OBJECT_RE.search(response_text)
         if json_match:
             response_text = json_match.group(0)
         
@@ -0,0 +1,112 @@
+"""
+Tests for the /chat answer caches in api - Gemini answers for general questions and
+rendered research-question answers - with Gemini and BigQuery replaced by fakes
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import api
+
+
+class FakeModels:
+    def __init__(self, text="**Hello**"):
+        self.text = text
+        self.calls = 0
+
+    async def generate_content(self, model, contents):
+        self.calls += 1
+        # Yield to the loop so concurrent callers overlap, as they would on a real request
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(text=self.text, usage_metadata=None)
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    models = FakeModels()
+    monkeypatch.setattr(api, "genai_client", SimpleNamespace(aio=SimpleNamespace(models=models)))
+    monkeypatch.setattr(api, "_response_cache", {})
+
+    async def fake_contents(message, user_role, file=None, file_bytes=None, file_digest=""):
+        return message
+
+    monkeypatch.setattr(api, "_general_contents", fake_contents)
+    return models
+
+
+@pytest.fixture
+def fake_research(monkeypatch):
+    calls = []
+
+    def fake_render(query_type, message, tool_context):
+        calls.append(query_type)
+        return "<p>answer</p>", True
+
+    monkeypatch.setattr(api, "_render_research_answer", fake_render)
+    monkeypatch.setattr(api, "_canned_cache", {})
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_general_answer_is_cached(fake_gemini):
+    key = api._response_cache_key("What is FAFSA?", "parent")
+
+    response_text, _ = await api._compute_general(key, True, "What is FAFSA?", "parent")
+
+    assert "<strong>Hello</strong>" in response_text
+    assert api._response_cache[key] == response_text
+
+
+@pytest.mark.asyncio
+async def test_time_sensitive_answer_is_not_cached(fake_gemini):
+    key = api._response_cache_key("What is happening today?", "parent")
+
+    await api._compute_general(key, False, "What is happening today?", "parent")
+
+    assert key not in api._response_cache
+
+
+def test_cache_key_ignores_case_and_whitespace():
+    assert api._response_cache_key("  What is FAFSA? ", "parent") == api._response_cache_key("what is fafsa?", "parent")
+    assert api._response_cache_key("What is FAFSA?", "parent") != api._response_cache_key("What is FAFSA?", "educator")
+
+
+@pytest.mark.asyncio
+async def test_research_answer_is_cached_per_role(fake_research):
+    await api._canned_response("high_need_low_tech", "Which schools need tech grants?", "parent", None)
+    await api._canned_response("high_need_low_tech", "Which schools need tech grants?", "parent", None)
+    await api._canned_response("high_need_low_tech", "Which schools need tech grants?", "educator", None)
+
+    assert fake_research == ["high_need_low_tech", "high_need_low_tech"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_research_requests_share_one_computation(fake_research):
+    await asyncio.gather(*(
+        api._canned_response("stem_excellence", "Strong STEM schools with small classes", "parent", None)
+        for _ in range(5)
+    ))
+
+    assert fake_research == ["stem_excellence"]
+    assert not api._canned_inflight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_general_questions_share_one_gemini_call(monkeypatch, fake_gemini):
+    import httpx
+
+    # Any non-None config makes ensure_initialized() a no-op
+    monkeypatch.setattr(api, "config", SimpleNamespace())
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        responses = await asyncio.gather(*(
+            client.post("/chat", data={"message": "What is FAFSA?", "user_role": "parent"})
+            for _ in range(3)
+        ))
+
+    bodies = [r.json() for r in responses]
+    assert fake_gemini.calls == 1
+    assert all(b["status"] == "success" for b in bodies)
+    assert len({b["response"] for b in bodies}) == 1
+    assert not api._general_inflight
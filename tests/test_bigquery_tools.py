@@ -0,0 +1,116 @@
+"""
+Tests for tools.bigquery_tools.query_bigquery paging, against a fake BigQuery client
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from tools import bigquery_tools
+
+
+class FakeRowIterator(list):
+    """Stand-in for google.cloud.bigquery RowIterator: the requested page plus total_rows"""
+    def __init__(self, rows, total_rows):
+        super().__init__(rows)
+        self.total_rows = total_rows
+
+
+class FakeClient:
+    def __init__(self, total_rows):
+        self.rows = [{"ncessch": str(i)} for i in range(total_rows)]
+        self.result_calls = []
+
+    def query(self, sql, job_config=None):
+        return SimpleNamespace(result=self._result)
+
+    def _result(self, max_results=None, start_index=None):
+        self.result_calls.append((max_results, start_index))
+        start = start_index or 0
+        end = len(self.rows) if max_results is None else start + max_results
+        return FakeRowIterator(self.rows[start:end], len(self.rows))
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = FakeClient(total_rows=2500)
+    monkeypatch.setattr(bigquery_tools, "get_bigquery_client", lambda project_id: client)
+    return client
+
+
+def _context():
+    return SimpleNamespace(state={"project_id": "test-project"})
+
+
+def test_returns_all_rows_by_default(fake_client):
+    result = bigquery_tools.query_bigquery("SELECT 1", _context())
+
+    assert result["status"] == "success"
+    assert result["row_count"] == 2500
+    assert result["has_more"] is False
+    assert fake_client.result_calls == [(None, 0)]
+
+
+def test_max_rows_fetches_one_page(fake_client):
+    result = bigquery_tools.query_bigquery("SELECT 1", _context(), max_rows=1000)
+
+    assert result["row_count"] == 1000
+    assert result["total_rows"] == 2500
+    assert result["has_more"] is True
+    assert result["next_start_index"] == 1000
+
+
+def test_start_index_continues_from_previous_page(fake_client):
+    result = bigquery_tools.query_bigquery("SELECT 1", _context(), max_rows=1000, start_index=2000)
+
+    assert result["row_count"] == 500
+    assert result["data"][0] == {"ncessch": "2000"}
+    assert result["has_more"] is False
+    assert result["next_start_index"] == 2500
+
+
+@pytest.fixture
+def cached_counter(monkeypatch):
+    """A _cached_tool-wrapped tool that counts real calls, with empty caches"""
+    monkeypatch.setattr(bigquery_tools, "_TOOL_RESULT_CACHE", {})
+    monkeypatch.setattr(bigquery_tools, "_DATASET_MODIFIED", {})
+    calls = []
+
+    @bigquery_tools._cached_tool
+    def tool(limit: int = 5, tool_context=None):
+        calls.append(limit)
+        return {"status": "success", "schools": [{"ncessch": "1"}]}
+
+    tool.calls = calls
+    return tool
+
+
+def _freshness(monkeypatch, last_modified):
+    monkeypatch.setattr(bigquery_tools, "_read_last_modified", lambda project_id, dataset: last_modified)
+
+
+def test_cached_tool_reuses_result_while_dataset_unchanged(monkeypatch, cached_counter):
+    _freshness(monkeypatch, 1700000000000)
+
+    cached_counter(limit=5, tool_context=_context())
+    cached_counter(limit=5.0, tool_context=_context())
+
+    assert cached_counter.calls == [5]
+
+
+def test_cached_tool_returns_independent_copies(monkeypatch, cached_counter):
+    _freshness(monkeypatch, 1700000000000)
+
+    first = cached_counter(tool_context=_context())
+    first["schools"][0]["ncessch"] = "mutated"
+    second = cached_counter(tool_context=_context())
+
+    assert second["schools"][0]["ncessch"] == "1"
+
+
+def test_cached_tool_skips_cache_when_freshness_unknown(monkeypatch, cached_counter):
+    _freshness(monkeypatch, None)
+
+    cached_counter(tool_context=_context())
+    cached_counter(tool_context=_context())
+
+    assert cached_counter.calls == [5, 5]
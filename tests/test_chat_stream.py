@@ -0,0 +1,82 @@
+"""
+Tests for the /chat/stream server-sent event sequence, with Gemini and BigQuery replaced by fakes
+"""
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import api
+
+
+class FakeStreamingModels:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def generate_content_stream(self, model, contents):
+        async def stream():
+            for text in self.chunks:
+                yield SimpleNamespace(text=text)
+        return stream()
+
+
+@pytest.fixture
+def initialized(monkeypatch):
+    # Any non-None config makes ensure_initialized() a no-op
+    monkeypatch.setattr(api, "config", SimpleNamespace())
+    monkeypatch.setattr(api, "_response_cache", {})
+    monkeypatch.setattr(api, "_canned_cache", {})
+
+
+def _parse_events(body: str):
+    """Split an SSE body into (event name, data) pairs; unnamed events are "message" """
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = "message", None
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                name = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((name, data))
+    return events
+
+
+async def _stream(message):
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/chat/stream", data={"message": message, "user_role": "parent"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return _parse_events(response.text)
+
+
+@pytest.mark.asyncio
+async def test_general_question_streams_text_then_html_then_done(monkeypatch, initialized):
+    models = FakeStreamingModels(["**Hello**", " there"])
+    monkeypatch.setattr(api, "genai_client", SimpleNamespace(aio=SimpleNamespace(models=models)))
+
+    events = await _stream("What is FAFSA?")
+
+    assert [name for name, _ in events] == ["message", "message", "html", "done"]
+    assert [data["text"] for _, data in events[:2]] == ["**Hello**", " there"]
+    assert "<strong>Hello</strong> there" in events[2][1]["html"]
+
+
+@pytest.mark.asyncio
+async def test_research_question_skips_to_html(monkeypatch, initialized):
+    monkeypatch.setattr(api, "_render_research_answer", lambda query_type, message, tool_context: ("<p>answer</p>", True))
+
+    events = await _stream("Find schools with strong STEM programs and small classes")
+
+    assert events == [("html", {"html": "<p>answer</p>"}), ("done", {})]
+
+
+@pytest.mark.asyncio
+async def test_gemini_failure_sends_fallback_html(monkeypatch, initialized):
+    monkeypatch.setattr(api, "genai_client", None)
+
+    events = await _stream("What is <FAFSA>?")
+
+    assert [name for name, _ in events] == ["html", "done"]
+    assert "What is &lt;FAFSA&gt;?" in events[0][1]["html"]
@@ -0,0 +1,31 @@
+"""
+Tests for grade → school level lookups in the parent services MCP server
+"""
+import pytest
+
+from mcp_servers.config import grade_to_level
+from mcp_servers.tools.student_profile import _enrich_profile
+
+
+@pytest.mark.parametrize("grade, expected", [
+    ("K", 1),
+    ("k", 1),
+    (" Kindergarten ", 1),
+    ("5", 1),
+    ("Sixth", 2),
+    ("8", 2),
+    ("NINTH", 3),
+    ("12", 3),
+    ("pre-k", 0),
+    ("", 0),
+])
+def test_grade_to_level(grade, expected):
+    assert grade_to_level(grade) == expected
+
+
+def test_kindergarten_profile_is_elementary():
+    # Regression: GRADE_TO_LEVEL was keyed "K" but looked up lowercased, so this came back 0
+    enriched = _enrich_profile({"grade_entering": "K"})
+
+    assert enriched["school_level"] == 1
+    assert enriched["school_level_name"] == "Elementary"
@@ -0,0 +1,63 @@
+"""
+Tests for the /health liveness and /ready readiness probes
+"""
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import api
+
+
+@pytest.fixture
+def warmups(monkeypatch):
+    """Replace the background initialization started by /ready with a no-op"""
+    async def fake_warmup():
+        pass
+
+    monkeypatch.setattr(api, "_warmup", fake_warmup)
+    monkeypatch.setattr(api, "_warmup_task", None)
+
+
+async def _get(path):
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(path)
+
+
+@pytest.mark.asyncio
+async def test_ready_returns_503_until_initialized(monkeypatch, warmups):
+    monkeypatch.setattr(api, "config", None)
+
+    response = await _get("/ready")
+
+    assert response.status_code == 503
+    assert response.json() == {"status": "initializing"}
+    assert api._warmup_task is not None
+
+
+@pytest.mark.asyncio
+async def test_ready_once_initialized(monkeypatch, warmups):
+    monkeypatch.setattr(api, "config", SimpleNamespace(project_id="test-project", bigquery_dataset="education_data"))
+    monkeypatch.setattr(api, "genai_client", None)
+
+    response = await _get("/ready")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "ready",
+        "project_id": "test-project",
+        "dataset": "education_data",
+        "gemini": False
+    }
+    assert api._warmup_task is None
+
+
+@pytest.mark.asyncio
+async def test_health_does_not_wait_for_initialization(monkeypatch):
+    monkeypatch.setattr(api, "config", None)
+
+    response = await _get("/health")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "healthy", "agent": "ready"}
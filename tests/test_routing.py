@@ -0,0 +1,29 @@
+"""
+Routing tests for api._research_query_type - which chat messages short-circuit to a
+canned research-question answer and which go to Gemini
+"""
+import pytest
+
+from api import _research_query_type
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Which schools should we prioritize for technology grants?", "high_need_low_tech"),
+    ("Schools with high low-income % and low tech spending", "high_need_low_tech"),
+    ("Show me high-performing high-need schools", "high_grad_low_funding"),
+    ("Schools with high graduation rates despite below-average funding", "high_grad_low_funding"),
+    ("Find schools with strong STEM programs and small classes", "stem_excellence"),
+])
+def test_research_questions_are_routed(message, expected):
+    assert _research_query_type(message) == expected
+
+
+@pytest.mark.parametrize("message", [
+    "I need help writing a grant proposal for my classroom",
+    "Do teachers need a grant to attend PD?",
+    "Tips for a high-performing classroom in a high-need area",
+    "What is STEM?",
+    "How do I prepare my child for high school?",
+])
+def test_general_questions_go_to_gemini(message):
+    assert _research_query_type(message) is None
@@ -0,0 +1,51 @@
+"""
+Tests for mcp_servers.tools.school_matcher.rank_schools
+"""
+from mcp_servers.tools import school_matcher
+from mcp_servers.tools.school_matcher import rank_schools
+
+PROFILE = {"location": {"city": "Sacramento"}}
+
+
+def _school(ncessch, base_match_score, city="SACRAMENTO"):
+    return {"ncessch": ncessch, "base_match_score": base_match_score, "city_location": city, "charter": 0}
+
+
+SCHOOLS = [
+    _school("a", 0.60),
+    _school("b", 0.90, city="FRESNO"),
+    _school("c", 0.90),
+    _school("d", 0.75),
+]
+
+
+def test_ranks_by_location_adjusted_score():
+    ranked = rank_schools(SCHOOLS, PROFILE)
+
+    assert [s["ncessch"] for s in ranked] == ["c", "b", "d", "a"]
+    assert [s["rank"] for s in ranked] == [1, 2, 3, 4]
+    assert ranked[0]["match_score"] == 91.5
+    assert ranked[1]["distance_score"] == 0.5
+
+
+def test_top_k_returns_only_the_best_schools(monkeypatch):
+    reasoned = []
+    real_reasoning = school_matcher._generate_match_reasoning
+
+    def tracking_reasoning(school, student_profile, match_score):
+        reasoned.append(school["ncessch"])
+        return real_reasoning(school, student_profile, match_score)
+
+    monkeypatch.setattr(school_matcher, "_generate_match_reasoning", tracking_reasoning)
+
+    ranked = rank_schools(SCHOOLS, PROFILE, top_k=2)
+
+    assert [s["ncessch"] for s in ranked] == ["c", "b"]
+    assert reasoned == ["c", "b"]
+    assert all(s["match_reasoning"] for s in ranked)
+
+
+def test_ranking_does_not_mutate_input():
+    rank_schools(SCHOOLS, PROFILE, top_k=1)
+
+    assert "rank" not in SCHOOLS[2]
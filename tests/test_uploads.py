@@ -0,0 +1,48 @@
+"""
+Tests for api._read_upload - the per-file size limit on chat attachments
+"""
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+import api
+
+MB = 1024 * 1024
+
+
+def _upload(data: bytes, size=None):
+    """An upload as Starlette hands it over; size is what it recorded while spooling (None if unknown)"""
+    return UploadFile(file=io.BytesIO(data), size=size, filename="report.pdf")
+
+
+@pytest.mark.asyncio
+async def test_upload_within_limit_is_read():
+    data = b"x" * (2 * MB)
+
+    assert await api._read_upload(_upload(data, size=len(data)), max_mb=20) == data
+
+
+@pytest.mark.asyncio
+async def test_oversize_upload_is_rejected_before_reading():
+    upload = _upload(b"x" * (2 * MB), size=21 * MB)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await api._read_upload(upload, max_mb=20, label="PDF file")
+
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "PDF file too large. Max 20MB."
+    assert upload.file.tell() == 0
+
+
+@pytest.mark.asyncio
+async def test_upload_without_recorded_size_stops_reading_past_limit():
+    data = b"x" * (5 * MB)
+    upload = _upload(data)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await api._read_upload(upload, max_mb=1)
+
+    assert exc_info.value.status_code == 400
+    # Gave up after the chunk that crossed the limit instead of buffering the whole body
+    assert upload.file.tell() <= MB + api.UPLOAD_CHUNK_BYTES
@@ -0,0 +1,61 @@
+"""
+Shared BigQuery client cache
+
+Kept free of ADK imports so the standalone MCP server can reuse it without
+pulling in the agent tools (tools.bigquery_tools re-exports get_bigquery_client).
+"""
+from typing import Dict
+from google.cloud import bigquery
+import google.auth
+import subprocess
+import threading
+import time
+
+
+# One BigQuery client per project, shared by every tool call and thread.
+# Entries are (client, expires_at); ADC clients refresh their own credentials
+# and never expire, clients built from a gcloud access token are rebuilt
+# before the token's 1h lifetime runs out.
+_CLIENTS: Dict[str, tuple] = {}
+_CLIENTS_LOCK = threading.Lock()
+_GCLOUD_TOKEN_TTL = 50 * 60
+
+
+def _build_bigquery_client(project_id: str) -> tuple:
+    """
+    Create a BigQuery client with proper authentication.
+    Falls back to multiple auth methods to ensure it works.
+    """
+    try:
+        # Application default credentials (refresh automatically)
+        credentials, _ = google.auth.default()
+        return bigquery.Client(project=project_id, credentials=credentials), None
+    except Exception:
+        pass
+    
+    try:
+        # Fall back to the active gcloud login
+        result = subprocess.run(
+            ['gcloud', 'auth', 'print-access-token'],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        access_token = result.stdout.strip()
+        
+        from google.oauth2.credentials import Credentials
+        
+        creds = Credentials(token=access_token)
+        return bigquery.Client(project=project_id, credentials=creds), time.monotonic() + _GCLOUD_TOKEN_TTL
+    except Exception:
+        # Last resort - try without explicit credentials
+        return bigquery.Client(project=project_id), None
+
+
+def get_bigquery_client(project_id: str) -> bigquery.Client:
+    """Return the shared BigQuery client for a project, creating it on first use (thread-safe)."""
+    with _CLIENTS_LOCK:
+        entry = _CLIENTS.get(project_id)
+        if entry is None or (entry[1] is not None and time.monotonic() >= entry[1]):
+            entry = _CLIENTS[project_id] = _build_bigquery_client(project_id)
+        return entry[0]
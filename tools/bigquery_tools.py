@@ -5,54 +5,186 @@ Uses real tables: ccd_directory, graduation_rates, district_finance, stem_*
 from typing import Dict, Any, List, Optional
 from google.cloud import bigquery
 from google.adk.tools import ToolContext
-import google.auth
-import subprocess
 import os
+import asyncio
+import copy
+import functools
+import inspect
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
+from tools.bigquery_client import get_bigquery_client
 
+logger = logging.getLogger(__name__)
 
-def _get_bigquery_client(project_id: str):
-    """
-    Get BigQuery client with proper authentication.
-    Falls back to multiple auth methods to ensure it works.
-    """
+# Shared pool so independent BigQuery jobs (e.g. state averages + main query)
+# run side by side instead of back to back
+_QUERY_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="bq-query")
+
+# Pre-joined school table (see build_school_full_table). The research-question
+# tools scan it instead of re-joining ccd/finance/graduation/AP on every call.
+# Opt-in until the table has been built in the target dataset.
+SCHOOL_FULL_TABLE = "school_full"
+USE_SCHOOL_FULL_TABLE = os.getenv("USE_SCHOOL_FULL_TABLE", "false").lower() == "true"
+
+# ccd_directory_v2 = ccd_directory plus a stored combokey column, clustered by it
+# (see build_ccd_directory_v2). STEM joins then compare plain columns instead of
+# computing CONCAT(leaid, school_id) per row. Opt-in until the table is built.
+USE_CCD_COMBOKEY = os.getenv("USE_CCD_COMBOKEY", "false").lower() == "true"
+CCD_TABLE = "ccd_directory_v2" if USE_CCD_COMBOKEY else "ccd_directory"
+CCD_COMBOKEY = "c.combokey" if USE_CCD_COMBOKEY else "CONCAT(c.leaid, c.school_id)"
+
+# Searchable STEM courses: course → (source table, enrollment expression)
+STEM_COURSES = {
+    "ap": ("stem_advanced_placement", "TOT_APENR_M + TOT_APENR_F"),
+    "calculus": ("stem_calculus", "SCH_ENRL_CALC_M + SCH_ENRL_CALC_F"),
+    "physics": ("stem_physics", "SCH_ENR_PHYS_M + SCH_ENR_PHYS_F"),
+    "chemistry": ("stem_chemistry", "SCH_ENR_CHEM_M + SCH_ENR_CHEM_F"),
+    "biology": ("stem_biology", "SCH_ENR_BIO_M + SCH_ENR_BIO_F"),
+}
+
+# Long-format (combokey, course, enrolled) table built from STEM_COURSES
+# (see build_stem_courses_table) - one clustered scan instead of a table per course
+STEM_COURSES_TABLE = "stem_courses"
+USE_STEM_COURSES_TABLE = os.getenv("USE_STEM_COURSES_TABLE", "false").lower() == "true"
+
+
+# Research-tool results keyed by (tool, normalized args, dataset freshness).
+# Paraphrased questions resolve to the same tool arguments, so they share entries;
+# the last-modified anchor drops everything as soon as the data is reloaded.
+_TOOL_RESULT_CACHE = TTLCache(maxsize=256, ttl=3600)
+_TOOL_CACHE_LOCK = threading.Lock()
+
+# Last known dataset modification time per (project_id, dataset), as
+# (last_modified_ms, checked_at). Re-read in the background once older than
+# _FRESHNESS_TTL, so cache lookups never wait on the __TABLES__ query.
+_DATASET_MODIFIED: Dict[tuple, tuple] = {}
+_FRESHNESS_TTL = 300
+_FRESHNESS_REFRESHING = set()
+
+
+def _read_last_modified(project_id: str, dataset: str) -> Optional[int]:
+    """Query the latest table modification time (ms) in the dataset; None if it can't be read."""
+    key = (project_id, dataset)
     try:
-        # Try using gcloud access token (works with active gcloud auth)
-        try:
-            result = subprocess.run(
-                ['gcloud', 'auth', 'print-access-token'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            access_token = result.stdout.strip()
-            
-            from google.auth.transport.requests import Request
-            from google.oauth2.credentials import Credentials
-            
-            creds = Credentials(token=access_token)
-            return bigquery.Client(project=project_id, credentials=creds)
-        except:
-            # Fallback to default credentials
-            credentials, _ = google.auth.default()
-            return bigquery.Client(project=project_id, credentials=credentials)
+        client = get_bigquery_client(project_id)
+        rows = client.query(
+            f"SELECT MAX(last_modified_time) AS ts FROM `{project_id}.{dataset}.__TABLES__`"
+        ).result()
+        last_modified = next(iter(rows)).ts
     except Exception as e:
-        # Last resort - try without explicit credentials
-        return bigquery.Client(project=project_id)
+        logger.warning("Could not read dataset freshness: %s", e)
+        last_modified = None
+    
+    with _TOOL_CACHE_LOCK:
+        _FRESHNESS_REFRESHING.discard(key)
+        if last_modified is None:
+            # Unknown freshness - stop serving cached results for this dataset
+            _DATASET_MODIFIED.pop(key, None)
+        else:
+            _DATASET_MODIFIED[key] = (last_modified, time.monotonic())
+    return last_modified
+
+
+def _known_last_modified(project_id: str, dataset: str) -> Optional[int]:
+    """Last known modification time for the dataset (refreshed in the background when stale), or None."""
+    key = (project_id, dataset)
+    with _TOOL_CACHE_LOCK:
+        entry = _DATASET_MODIFIED.get(key)
+        if entry is None:
+            return None
+        last_modified, checked_at = entry
+        refresh = time.monotonic() - checked_at >= _FRESHNESS_TTL and key not in _FRESHNESS_REFRESHING
+        if refresh:
+            _FRESHNESS_REFRESHING.add(key)
+    if refresh:
+        _QUERY_POOL.submit(_read_last_modified, project_id, dataset)
+    return last_modified
+
+
+def _normalize_arg(value: Any) -> Any:
+    """Collapse equivalent argument spellings ("Calculus " vs "calculus", 75 vs 75.0)."""
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return round(float(value), 2)
+    return value
+
+
+def _cached_tool(func):
+    """
+    Cache a research tool's successful results per normalized arguments.
+    
+    Entries are only reused while the dataset's last-modified time is unchanged;
+    if that time can't be read, results are not cached. Callers get their own
+    copy of the result, so mutating it never touches the cached entry.
+    Job priority is not part of the key - BATCH and INTERACTIVE return the same rows.
+    """
+    signature = inspect.signature(func)
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        tool_context = bound.arguments.get("tool_context")
+        if tool_context is None:
+            return func(*args, **kwargs)
+        
+        project_id = tool_context.state.get("project_id")
+        dataset = tool_context.state.get("bigquery_dataset", "education_data")
+        params = tuple(sorted(
+            (name, _normalize_arg(value))
+            for name, value in bound.arguments.items()
+            if name not in ("tool_context", "priority")
+        ))
+        key = (func.__name__, project_id, dataset, params)
+        
+        last_modified = _known_last_modified(project_id, dataset)
+        if last_modified is not None:
+            with _TOOL_CACHE_LOCK:
+                cached = _TOOL_RESULT_CACHE.get(key + (last_modified,))
+            if cached is not None:
+                return copy.deepcopy(cached)
+            result = func(*args, **kwargs)
+        else:
+            # First lookup for this dataset - read its freshness alongside the query
+            freshness = _QUERY_POOL.submit(_read_last_modified, project_id, dataset)
+            result = func(*args, **kwargs)
+            last_modified = freshness.result()
+        
+        if last_modified is not None and result.get("status") == "success":
+            with _TOOL_CACHE_LOCK:
+                _TOOL_RESULT_CACHE[key + (last_modified,)] = copy.deepcopy(result)
+        return result
+    
+    return wrapper
 
 
 def query_bigquery(
     sql_query: str, 
-    tool_context: ToolContext
+    tool_context: ToolContext,
+    priority: str = "INTERACTIVE",
+    max_rows: Optional[int] = None,
+    start_index: int = 0
 ) -> Dict[str, Any]:
     """
     Execute a SQL query against BigQuery and return results.
     
+    All rows are returned unless max_rows is set. With max_rows, only that page
+    is fetched; if 'has_more' is true, call again with start_index=next_start_index
+    for the next page (BigQuery serves the repeat query from its result cache).
+    
     Args:
         sql_query: A valid BigQuery SQL query string
         tool_context: ADK tool context for state management
+        priority: "INTERACTIVE" (default) or "BATCH" for non-urgent jobs
+        max_rows: Maximum rows to return in this page (default: all rows)
+        start_index: Row offset of the page to fetch (default: 0)
         
     Returns:
-        Dictionary with 'status', 'data' (list of dicts), and 'row_count'
+        Dictionary with 'status', 'data' (list of dicts), 'row_count', 'total_rows' and 'has_more'
     """
     try:
         project_id = tool_context.state.get("project_id")
@@ -63,13 +195,20 @@ def query_bigquery(
                 "data": []
             }
         
-        # Get authenticated client
-        client = _get_bigquery_client(project_id)
-        query_job = client.query(sql_query)
-        results = query_job.result()
+        # Shared authenticated client
+        client = get_bigquery_client(project_id)
+        # BATCH jobs queue for idle slots - cheaper and don't compete with user traffic
+        job_config = bigquery.QueryJobConfig(
+            priority=bigquery.QueryPriority.BATCH if priority == "BATCH" else bigquery.QueryPriority.INTERACTIVE
+        )
+        query_job = client.query(sql_query, job_config=job_config)
+        # With max_rows, fetch a single page instead of hydrating the whole result set
+        results = query_job.result(max_results=max_rows, start_index=start_index)
         
         # Convert to list of dicts
         rows = [dict(row) for row in results]
+        total_rows = results.total_rows or len(rows)
+        next_start_index = start_index + len(rows)
         
         # Store in state
         tool_context.state["last_bq_query"] = sql_query
@@ -79,6 +218,9 @@ def query_bigquery(
             "status": "success",
             "data": rows,
             "row_count": len(rows),
+            "total_rows": total_rows,
+            "has_more": next_start_index < total_rows,
+            "next_start_index": next_start_index,
             "query": sql_query
         }
         
@@ -259,11 +401,16 @@ def get_district_finance(
 
 
 def get_state_averages(
-    tool_context: ToolContext = None
+    tool_context: ToolContext = None,
+    priority: str = "INTERACTIVE"
 ) -> Dict[str, Any]:
     """
     Get California state averages for comparison.
     
+    Args:
+        tool_context: ADK tool context
+        priority: BigQuery job priority ("INTERACTIVE" or "BATCH")
+    
     Returns:
         Dictionary with state-wide average metrics
     """
@@ -284,18 +431,20 @@ def get_state_averages(
         WHERE c.enrollment >= 100
         """
         
-        result = query_bigquery(query, tool_context)
+        result = query_bigquery(query, tool_context, priority=priority)
         if result.get("status") == "success" and result.get("data"):
             return result["data"][0]
         return {}
     except Exception as e:
-        print(f"Error getting state averages: {e}")
+        logger.warning("Error getting state averages: %s", e)
         return {}
 
 
+@_cached_tool
 def find_high_need_low_tech_spending(
     county: Optional[str] = None,
     limit: int = 5,
+    priority: str = "INTERACTIVE",
     tool_context: ToolContext = None
 ) -> Dict[str, Any]:
     """
@@ -307,6 +456,7 @@ def find_high_need_low_tech_spending(
     Args:
         county: Optional county code to filter by
         limit: Number of schools to return (default: 5)
+        priority: BigQuery job priority - "BATCH" for non-interactive runs (nightly refresh)
         tool_context: ADK tool context
         
     Returns:
@@ -316,32 +466,55 @@ def find_high_need_low_tech_spending(
         project_id = tool_context.state.get("project_id")
         dataset = tool_context.state.get("bigquery_dataset", "education_data")
         
-        # Get state averages for comparison
-        state_avg = get_state_averages(tool_context)
+        # Get state averages for comparison (runs concurrently with the main query)
+        state_avg_future = _QUERY_POOL.submit(get_state_averages, tool_context, priority)
         
-        query = f"""
-        SELECT 
-            c.school_name,
-            c.lea_name,
-            c.city_location,
-            c.county_code,
-            c.enrollment,
-            c.free_lunch,
-            c.latitude,
-            c.longitude,
-            ROUND(c.free_lunch / NULLIF(c.enrollment, 0) * 100, 1) as low_income_pct,
-            ROUND(c.enrollment / NULLIF(c.teachers_fte, 0), 1) as student_teacher_ratio,
-            COALESCE(f.per_pupil_total, 0) as per_pupil_total,
-            COALESCE(f.per_pupil_instruction, 0) as per_pupil_instruction,
-            -- Priority score: prioritize high low-income %
-            (c.free_lunch / NULLIF(c.enrollment, 0) * 100) as priority_score
-        FROM `{project_id}.{dataset}.ccd_directory` c
-        LEFT JOIN `{project_id}.{dataset}.district_finance` f
-          ON c.leaid = f.LEAID
-        WHERE c.enrollment >= 100
-          AND c.free_lunch > 0
-          AND (c.free_lunch / NULLIF(c.enrollment, 0) * 100) >= 50
-        """
+        if USE_SCHOOL_FULL_TABLE:
+            # Single scan + filter on the pre-joined table
+            query = f"""
+            SELECT 
+                school_name,
+                lea_name,
+                city_location,
+                county_code,
+                enrollment,
+                free_lunch,
+                latitude,
+                longitude,
+                low_income_pct,
+                student_teacher_ratio,
+                COALESCE(per_pupil_total, 0) as per_pupil_total,
+                COALESCE(per_pupil_instruction, 0) as per_pupil_instruction,
+                low_income_pct_raw as priority_score
+            FROM `{project_id}.{dataset}.{SCHOOL_FULL_TABLE}` c
+            WHERE enrollment >= 100
+              AND free_lunch > 0
+              AND low_income_pct_raw >= 50
+            """
+        else:
+            query = f"""
+            SELECT 
+                c.school_name,
+                c.lea_name,
+                c.city_location,
+                c.county_code,
+                c.enrollment,
+                c.free_lunch,
+                c.latitude,
+                c.longitude,
+                ROUND(c.free_lunch / NULLIF(c.enrollment, 0) * 100, 1) as low_income_pct,
+                ROUND(c.enrollment / NULLIF(c.teachers_fte, 0), 1) as student_teacher_ratio,
+                COALESCE(f.per_pupil_total, 0) as per_pupil_total,
+                COALESCE(f.per_pupil_instruction, 0) as per_pupil_instruction,
+                -- Priority score: prioritize high low-income %
+                (c.free_lunch / NULLIF(c.enrollment, 0) * 100) as priority_score
+            FROM `{project_id}.{dataset}.ccd_directory` c
+            LEFT JOIN `{project_id}.{dataset}.district_finance` f
+              ON c.leaid = f.LEAID
+            WHERE c.enrollment >= 100
+              AND c.free_lunch > 0
+              AND (c.free_lunch / NULLIF(c.enrollment, 0) * 100) >= 50
+            """
         
         if county:
             query += f" AND c.county_code = '{county}'"
@@ -351,7 +524,8 @@ def find_high_need_low_tech_spending(
         LIMIT {limit}
         """
         
-        result = query_bigquery(query, tool_context)
+        result = query_bigquery(query, tool_context, priority=priority)
+        state_avg = state_avg_future.result()
         
         if result.get("status") == "error" or result.get("row_count", 0) == 0:
             return {
@@ -384,10 +558,12 @@ def find_high_need_low_tech_spending(
         }
 
 
+@_cached_tool
 def find_high_graduation_low_funding(
     min_graduation_rate: float = 75.0,  # Lowered from 85 to 75
     min_low_income_pct: float = 50.0,   # Changed from max to min, looking for high-need schools
     limit: int = 10,
+    priority: str = "INTERACTIVE",
     tool_context: ToolContext = None
 ) -> Dict[str, Any]:
     """
@@ -400,6 +576,7 @@ def find_high_graduation_low_funding(
         min_graduation_rate: Minimum graduation rate threshold (default: 85%)
         max_low_income_pct: Minimum low-income % to indicate high need (default: 70%)
         limit: Number of schools to return
+        priority: BigQuery job priority - "BATCH" for non-interactive runs (nightly refresh)
         tool_context: ADK tool context
         
     Returns:
@@ -409,43 +586,68 @@ def find_high_graduation_low_funding(
         project_id = tool_context.state.get("project_id")
         dataset = tool_context.state.get("bigquery_dataset", "education_data")
         
-        # Get state averages for comparison
-        state_avg = get_state_averages(tool_context)
+        # Get state averages for comparison (runs concurrently with the main query)
+        state_avg_future = _QUERY_POOL.submit(get_state_averages, tool_context, priority)
         
-        query = f"""
-        SELECT 
-            c.school_name,
-            c.lea_name,
-            c.city_location,
-            c.enrollment,
-            c.latitude,
-            c.longitude,
-            ROUND(c.free_lunch / NULLIF(c.enrollment, 0) * 100, 1) as low_income_pct,
-            g.grad_rate_midpt as graduation_rate,
-            g.cohort_num,
-            ROUND(c.enrollment / NULLIF(c.teachers_fte, 0), 1) as student_teacher_ratio,
-            c.charter,
-            f.per_pupil_total,
-            f.per_pupil_instruction
-        FROM `{project_id}.{dataset}.ccd_directory` c
-        INNER JOIN `{project_id}.{dataset}.graduation_rates` g
-          ON c.ncessch = g.ncessch
-        LEFT JOIN `{project_id}.{dataset}.district_finance` f
-          ON c.leaid = f.LEAID
-        WHERE g.grad_rate_midpt >= {min_graduation_rate}
-          AND (c.free_lunch / NULLIF(c.enrollment, 0) * 100) >= {min_low_income_pct}
-          AND c.enrollment >= 100
-          AND g.race = 99
-          AND g.disability = 99
-          AND g.econ_disadvantaged = 99
-          AND g.lep = 99
-          AND g.homeless = 99
-          AND g.foster_care = 99
-        ORDER BY g.grad_rate_midpt DESC, low_income_pct DESC
-        LIMIT {limit}
-        """
+        if USE_SCHOOL_FULL_TABLE:
+            query = f"""
+            SELECT 
+                school_name,
+                lea_name,
+                city_location,
+                enrollment,
+                latitude,
+                longitude,
+                low_income_pct,
+                graduation_rate,
+                cohort_num,
+                student_teacher_ratio,
+                charter,
+                per_pupil_total,
+                per_pupil_instruction
+            FROM `{project_id}.{dataset}.{SCHOOL_FULL_TABLE}` c
+            WHERE graduation_rate >= {min_graduation_rate}
+              AND low_income_pct_raw >= {min_low_income_pct}
+              AND enrollment >= 100
+            ORDER BY graduation_rate DESC, low_income_pct DESC
+            LIMIT {limit}
+            """
+        else:
+            query = f"""
+            SELECT 
+                c.school_name,
+                c.lea_name,
+                c.city_location,
+                c.enrollment,
+                c.latitude,
+                c.longitude,
+                ROUND(c.free_lunch / NULLIF(c.enrollment, 0) * 100, 1) as low_income_pct,
+                g.grad_rate_midpt as graduation_rate,
+                g.cohort_num,
+                ROUND(c.enrollment / NULLIF(c.teachers_fte, 0), 1) as student_teacher_ratio,
+                c.charter,
+                f.per_pupil_total,
+                f.per_pupil_instruction
+            FROM `{project_id}.{dataset}.ccd_directory` c
+            INNER JOIN `{project_id}.{dataset}.graduation_rates` g
+              ON c.ncessch = g.ncessch
+            LEFT JOIN `{project_id}.{dataset}.district_finance` f
+              ON c.leaid = f.LEAID
+            WHERE g.grad_rate_midpt >= {min_graduation_rate}
+              AND (c.free_lunch / NULLIF(c.enrollment, 0) * 100) >= {min_low_income_pct}
+              AND c.enrollment >= 100
+              AND g.race = 99
+              AND g.disability = 99
+              AND g.econ_disadvantaged = 99
+              AND g.lep = 99
+              AND g.homeless = 99
+              AND g.foster_care = 99
+            ORDER BY g.grad_rate_midpt DESC, low_income_pct DESC
+            LIMIT {limit}
+            """
         
-        result = query_bigquery(query, tool_context)
+        result = query_bigquery(query, tool_context, priority=priority)
+        state_avg = state_avg_future.result()
         
         if result.get("status") == "error" or result.get("row_count", 0) == 0:
             return {
@@ -478,10 +680,12 @@ def find_high_graduation_low_funding(
         }
 
 
+@_cached_tool
 def find_strong_stem_low_class_size(
     max_student_teacher_ratio: int = 25,  # Increased from 20 to 25
     school_level: int = 3,  # High schools
     limit: int = 10,
+    priority: str = "INTERACTIVE",
     tool_context: ToolContext = None
 ) -> Dict[str, Any]:
     """
@@ -492,6 +696,7 @@ def find_strong_stem_low_class_size(
         max_student_teacher_ratio: Maximum student-teacher ratio (default: 20)
         school_level: School level filter (3=High School)
         limit: Number of schools to return
+        priority: BigQuery job priority - "BATCH" for non-interactive runs (nightly refresh)
         tool_context: ADK tool context
         
     Returns:
@@ -501,37 +706,62 @@ def find_strong_stem_low_class_size(
         project_id = tool_context.state.get("project_id")
         dataset = tool_context.state.get("bigquery_dataset", "education_data")
         
-        # Get state averages for comparison
-        state_avg = get_state_averages(tool_context)
+        # Get state averages for comparison (runs concurrently with the main query)
+        state_avg_future = _QUERY_POOL.submit(get_state_averages, tool_context, priority)
         
-        # Query with STEM data joined (using AP courses as STEM indicator)
-        query = f"""
-        SELECT 
-            c.school_name,
-            c.lea_name,
-            c.city_location,
-            c.enrollment,
-            c.latitude,
-            c.longitude,
-            ROUND(c.enrollment / NULLIF(c.teachers_fte, 0), 1) as student_teacher_ratio,
-            c.school_level,
-            c.charter,
-            ROUND(c.free_lunch / NULLIF(c.enrollment, 0) * 100, 1) as low_income_pct,
-            ap.SCH_APCOURSES as ap_courses,
-            COALESCE(ap.TOT_APENR_M, 0) + COALESCE(ap.TOT_APENR_F, 0) as total_ap_enrollment
-        FROM `{project_id}.{dataset}.ccd_directory` c
-        LEFT JOIN `{project_id}.{dataset}.stem_advanced_placement` ap
-          ON CONCAT(c.leaid, c.school_id) = ap.COMBOKEY
-        WHERE c.enrollment >= 100
-          AND c.teachers_fte > 0
-          AND (c.enrollment / c.teachers_fte) <= {max_student_teacher_ratio}
-          AND c.school_level = {school_level}
-          AND COALESCE(ap.SCH_APCOURSES, 0) >= 0  -- Show all schools, prefer those with AP
-        ORDER BY COALESCE(ap.SCH_APCOURSES, 0) DESC, student_teacher_ratio ASC
-        LIMIT {limit}
-        """
+        if USE_SCHOOL_FULL_TABLE:
+            query = f"""
+            SELECT 
+                school_name,
+                lea_name,
+                city_location,
+                enrollment,
+                latitude,
+                longitude,
+                student_teacher_ratio,
+                school_level,
+                charter,
+                low_income_pct,
+                ap_courses,
+                total_ap_enrollment
+            FROM `{project_id}.{dataset}.{SCHOOL_FULL_TABLE}` c
+            WHERE enrollment >= 100
+              AND teachers_fte > 0
+              AND (enrollment / teachers_fte) <= {max_student_teacher_ratio}
+              AND school_level = {school_level}
+            ORDER BY COALESCE(ap_courses, 0) DESC, student_teacher_ratio ASC
+            LIMIT {limit}
+            """
+        else:
+            # Query with STEM data joined (using AP courses as STEM indicator)
+            query = f"""
+            SELECT 
+                c.school_name,
+                c.lea_name,
+                c.city_location,
+                c.enrollment,
+                c.latitude,
+                c.longitude,
+                ROUND(c.enrollment / NULLIF(c.teachers_fte, 0), 1) as student_teacher_ratio,
+                c.school_level,
+                c.charter,
+                ROUND(c.free_lunch / NULLIF(c.enrollment, 0) * 100, 1) as low_income_pct,
+                ap.SCH_APCOURSES as ap_courses,
+                COALESCE(ap.TOT_APENR_M, 0) + COALESCE(ap.TOT_APENR_F, 0) as total_ap_enrollment
+            FROM `{project_id}.{dataset}.{CCD_TABLE}` c
+            LEFT JOIN `{project_id}.{dataset}.stem_advanced_placement` ap
+              ON {CCD_COMBOKEY} = ap.COMBOKEY
+            WHERE c.enrollment >= 100
+              AND c.teachers_fte > 0
+              AND (c.enrollment / c.teachers_fte) <= {max_student_teacher_ratio}
+              AND c.school_level = {school_level}
+              AND COALESCE(ap.SCH_APCOURSES, 0) >= 0  -- Show all schools, prefer those with AP
+            ORDER BY COALESCE(ap.SCH_APCOURSES, 0) DESC, student_teacher_ratio ASC
+            LIMIT {limit}
+            """
         
-        result = query_bigquery(query, tool_context)
+        result = query_bigquery(query, tool_context, priority=priority)
+        state_avg = state_avg_future.result()
         
         if result.get("status") == "error" or result.get("row_count", 0) == 0:
             return {
@@ -565,6 +795,7 @@ def find_strong_stem_low_class_size(
         }
 
 
+@_cached_tool
 def search_schools_with_stem(
     stem_course: str = "ap",  # Options: ap, calculus, physics, chemistry, biology
     min_enrollment: int = 10,
@@ -585,53 +816,52 @@ def search_schools_with_stem(
         project_id = tool_context.state.get("project_id")
         dataset = tool_context.state.get("bigquery_dataset", "education_data")
         
-        # Map course name to table
-        course_tables = {
-            "ap": "stem_advanced_placement",
-            "calculus": "stem_calculus",
-            "physics": "stem_physics",
-            "chemistry": "stem_chemistry",
-            "biology": "stem_biology"
-        }
-        
-        if stem_course not in course_tables:
+        if stem_course not in STEM_COURSES:
             return {
                 "status": "error",
-                "message": f"Invalid STEM course. Choose from: {list(course_tables.keys())}",
+                "message": f"Invalid STEM course. Choose from: {list(STEM_COURSES.keys())}",
                 "data": []
             }
         
-        table_name = course_tables[stem_course]
-        
-        # Different enrollment columns for different courses
-        if stem_course == "ap":
-            enrollment_col = "TOT_APENR_M + TOT_APENR_F"
-        elif stem_course == "calculus":
-            enrollment_col = "SCH_ENRL_CALC_M + SCH_ENRL_CALC_F"
-        elif stem_course == "physics":
-            enrollment_col = "SCH_ENR_PHYS_M + SCH_ENR_PHYS_F"
-        elif stem_course == "chemistry":
-            enrollment_col = "SCH_ENR_CHEM_M + SCH_ENR_CHEM_F"
-        elif stem_course == "biology":
-            enrollment_col = "SCH_ENR_BIO_M + SCH_ENR_BIO_F"
-        
-        query = f"""
-        SELECT 
-            c.school_name,
-            c.lea_name,
-            c.city_location,
-            c.enrollment as school_enrollment,
-            c.latitude,
-            c.longitude,
-            ({enrollment_col}) as course_enrollment,
-            ROUND(c.enrollment / NULLIF(c.teachers_fte, 0), 1) as student_teacher_ratio
-        FROM `{project_id}.{dataset}.ccd_directory` c
-        INNER JOIN `{project_id}.{dataset}.{table_name}` stem
-          ON CONCAT(c.leaid, c.school_id) = stem.COMBOKEY
-        WHERE ({enrollment_col}) >= {min_enrollment}
-        ORDER BY course_enrollment DESC
-        LIMIT 50
-        """
+        if USE_STEM_COURSES_TABLE:
+            # Clustered long-format table: filter one course, no per-course table switch
+            query = f"""
+            SELECT 
+                c.school_name,
+                c.lea_name,
+                c.city_location,
+                c.enrollment as school_enrollment,
+                c.latitude,
+                c.longitude,
+                stem.enrolled as course_enrollment,
+                ROUND(c.enrollment / NULLIF(c.teachers_fte, 0), 1) as student_teacher_ratio
+            FROM `{project_id}.{dataset}.{STEM_COURSES_TABLE}` stem
+            INNER JOIN `{project_id}.{dataset}.{CCD_TABLE}` c
+              ON stem.combokey = {CCD_COMBOKEY}
+            WHERE stem.course = '{stem_course}'
+              AND stem.enrolled >= {min_enrollment}
+            ORDER BY course_enrollment DESC
+            LIMIT 50
+            """
+        else:
+            table_name, enrollment_col = STEM_COURSES[stem_course]
+            query = f"""
+            SELECT 
+                c.school_name,
+                c.lea_name,
+                c.city_location,
+                c.enrollment as school_enrollment,
+                c.latitude,
+                c.longitude,
+                ({enrollment_col}) as course_enrollment,
+                ROUND(c.enrollment / NULLIF(c.teachers_fte, 0), 1) as student_teacher_ratio
+            FROM `{project_id}.{dataset}.{CCD_TABLE}` c
+            INNER JOIN `{project_id}.{dataset}.{table_name}` stem
+              ON {CCD_COMBOKEY} = stem.COMBOKEY
+            WHERE ({enrollment_col}) >= {min_enrollment}
+            ORDER BY course_enrollment DESC
+            LIMIT 50
+            """
         
         return query_bigquery(query, tool_context)
         
@@ -641,3 +871,192 @@ def search_schools_with_stem(
             "message": f"Error searching STEM courses: {str(e)}",
             "data": []
         }
+
+
+def build_ccd_directory_v2(
+    tool_context: ToolContext = None
+) -> Dict[str, Any]:
+    """
+    (Re)build ccd_directory_v2: ccd_directory with a stored combokey column.
+    
+    Clustered by combokey so STEM joins are cluster-aligned. Build it before
+    school_full, then set USE_CCD_COMBOKEY=true.
+    Not registered as an agent tool.
+    
+    Args:
+        tool_context: ADK tool context (or any object with a dict-like .state)
+        
+    Returns:
+        Dictionary with query status
+    """
+    project_id = tool_context.state.get("project_id")
+    dataset = tool_context.state.get("bigquery_dataset", "education_data")
+    
+    ddl = f"""
+    CREATE OR REPLACE TABLE `{project_id}.{dataset}.ccd_directory_v2`
+    CLUSTER BY combokey
+    AS
+    SELECT *, CONCAT(leaid, school_id) as combokey
+    FROM `{project_id}.{dataset}.ccd_directory`
+    """
+    
+    return query_bigquery(ddl, tool_context)
+
+
+def build_school_full_table(
+    tool_context: ToolContext = None
+) -> Dict[str, Any]:
+    """
+    (Re)build the pre-joined school_full table used by the research-question tools.
+    
+    One row per school with district finance, overall graduation rate and AP
+    offerings already attached, clustered by (leaid, ncessch) so the Q1/Q2/Q3
+    lookups are a single filtered scan. Run after each data load, then set
+    USE_SCHOOL_FULL_TABLE=true. Not registered as an agent tool.
+    
+    Args:
+        tool_context: ADK tool context (or any object with a dict-like .state)
+        
+    Returns:
+        Dictionary with query status
+    """
+    project_id = tool_context.state.get("project_id")
+    dataset = tool_context.state.get("bigquery_dataset", "education_data")
+    
+    # Data is California-only, so there is no useful partition column - cluster only
+    ddl = f"""
+    CREATE OR REPLACE TABLE `{project_id}.{dataset}.{SCHOOL_FULL_TABLE}`
+    CLUSTER BY leaid, ncessch
+    AS
+    SELECT 
+        c.ncessch,
+        c.leaid,
+        c.school_id,
+        c.school_name,
+        c.lea_name,
+        c.city_location,
+        c.county_code,
+        c.school_level,
+        c.enrollment,
+        c.teachers_fte,
+        c.free_lunch,
+        c.charter,
+        c.latitude,
+        c.longitude,
+        ROUND(c.free_lunch / NULLIF(c.enrollment, 0) * 100, 1) as low_income_pct,
+        (c.free_lunch / NULLIF(c.enrollment, 0) * 100) as low_income_pct_raw,
+        ROUND(c.enrollment / NULLIF(c.teachers_fte, 0), 1) as student_teacher_ratio,
+        f.per_pupil_total,
+        f.per_pupil_instruction,
+        g.grad_rate_midpt as graduation_rate,
+        g.cohort_num,
+        ap.SCH_APCOURSES as ap_courses,
+        COALESCE(ap.TOT_APENR_M, 0) + COALESCE(ap.TOT_APENR_F, 0) as total_ap_enrollment
+    FROM `{project_id}.{dataset}.{CCD_TABLE}` c
+    LEFT JOIN `{project_id}.{dataset}.district_finance` f
+      ON c.leaid = f.LEAID
+    LEFT JOIN `{project_id}.{dataset}.graduation_rates` g
+      ON c.ncessch = g.ncessch
+      AND g.race = 99
+      AND g.disability = 99
+      AND g.econ_disadvantaged = 99
+      AND g.lep = 99
+      AND g.homeless = 99
+      AND g.foster_care = 99
+    LEFT JOIN `{project_id}.{dataset}.stem_advanced_placement` ap
+      ON {CCD_COMBOKEY} = ap.COMBOKEY
+    """
+    
+    return query_bigquery(ddl, tool_context)
+
+
+def build_stem_courses_table(
+    tool_context: ToolContext = None
+) -> Dict[str, Any]:
+    """
+    (Re)build the long-format stem_courses table used by search_schools_with_stem.
+    
+    One row per (school, course) with the course enrollment, clustered by
+    combokey. Run after each data load, then set USE_STEM_COURSES_TABLE=true.
+    Not registered as an agent tool.
+    
+    Args:
+        tool_context: ADK tool context (or any object with a dict-like .state)
+        
+    Returns:
+        Dictionary with query status
+    """
+    project_id = tool_context.state.get("project_id")
+    dataset = tool_context.state.get("bigquery_dataset", "education_data")
+    
+    selects = "\n    UNION ALL\n".join(
+        f"    SELECT COMBOKEY as combokey, '{course}' as course, ({enrollment_col}) as enrolled "
+        f"FROM `{project_id}.{dataset}.{table_name}`"
+        for course, (table_name, enrollment_col) in STEM_COURSES.items()
+    )
+    ddl = f"""
+    CREATE OR REPLACE TABLE `{project_id}.{dataset}.{STEM_COURSES_TABLE}`
+    CLUSTER BY combokey, course
+    AS
+{selects}
+    """
+    
+    return query_bigquery(ddl, tool_context)
+
+
+def run_research_questions_batch(
+    tool_context: ToolContext = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run all 3 research-question queries as BATCH-priority BigQuery jobs.
+    
+    Intended for non-interactive contexts (nightly refresh, cache warm-up):
+    BATCH jobs are cheaper and leave interactive slots free for user queries.
+    Not registered as an agent tool - run it with `python main.py --warm-cache`.
+    
+    Args:
+        tool_context: ADK tool context (or any object with a dict-like .state)
+        
+    Returns:
+        Dictionary mapping query type to the tool result
+    """
+    # The find_* tools submit their state-averages query to _QUERY_POOL and wait
+    # on it, so they get their own short-lived pool rather than holding its workers
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="bq-batch") as executor:
+        futures = {
+            "high_need_low_tech": executor.submit(
+                find_high_need_low_tech_spending, limit=5, priority="BATCH", tool_context=tool_context
+            ),
+            "high_grad_low_funding": executor.submit(
+                find_high_graduation_low_funding, limit=10, priority="BATCH", tool_context=tool_context
+            ),
+            "stem_excellence": executor.submit(
+                find_strong_stem_low_class_size, limit=10, priority="BATCH", tool_context=tool_context
+            ),
+        }
+        return {query_type: future.result() for query_type, future in futures.items()}
+
+
+def _to_async(func):
+    """
+    Wrap a blocking BigQuery tool as a coroutine function.
+    
+    The wrapper keeps the tool's name, docstring and signature so ADK registers
+    it exactly like the sync version, but the BigQuery round-trip runs in a
+    worker thread - multiple tool calls emitted in one model turn can overlap.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
+
+
+# Async variants registered with the ADK agents
+query_bigquery_async = _to_async(query_bigquery)
+get_school_data_async = _to_async(get_school_data)
+get_graduation_data_async = _to_async(get_graduation_data)
+get_district_finance_async = _to_async(get_district_finance)
+find_high_need_low_tech_spending_async = _to_async(find_high_need_low_tech_spending)
+find_high_graduation_low_funding_async = _to_async(find_high_graduation_low_funding)
+find_strong_stem_low_class_size_async = _to_async(find_strong_stem_low_class_size)
+search_schools_with_stem_async = _to_async(search_schools_with_stem)
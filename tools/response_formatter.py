@@ -7,10 +7,15 @@ Generates rich responses with:
 """
 
 import os
+import html
+import json
+import logging
 from typing import Dict, Any, List, Optional
 import base64
 from io import BytesIO
 
+logger = logging.getLogger(__name__)
+
 
 def format_response_with_visualizations(
     query: str,
@@ -223,10 +228,6 @@ def _create_comparison_bar_chart(chart_id: str, title: str, labels: List[str],
                                 data: List[float], state_average: float, color: str, ylabel: str) -> str:
     """Create a bar chart with state average comparison line using Chart.js."""
     
-    # Convert to JSON properly
-    import json
-    import html
-    
     # Create array of state average for line
     state_avg_array = [state_average] * len(data)
     
@@ -273,10 +274,6 @@ def _create_bar_chart(chart_id: str, title: str, labels: List[str],
                      data: List[float], color: str, ylabel: str) -> str:
     """Create a single bar chart using Chart.js."""
     
-    # Convert to JSON properly
-    import json
-    import html
-    
     chart_config = {
         "type": "bar",
         "labels": labels,
@@ -303,9 +300,6 @@ def _create_bar_chart(chart_id: str, title: str, labels: List[str],
 
 def _generate_map(data: List[Dict[str, Any]], maps_api_key: str) -> str:
     """Generate Google Maps HTML with school markers."""
-    import json
-    import html
-    
     # Filter schools with valid coordinates
     schools_with_coords = [
         school for school in data 
@@ -478,6 +472,6 @@ def load_maps_api_key() -> Optional[str]:
             with open(key_path, 'r') as f:
                 return f.read().strip()
     except Exception as e:
-        print(f"Warning: Could not load Maps API key: {e}")
+        logger.warning("Could not load Maps API key: %s", e)
     return None
 